@@ -0,0 +1,7 @@
+import sys
+from os import path
+
+# the modules in here import each other by their bare names, python 3 only finds them that way with this folder on the path
+folder = path.dirname(path.abspath(__file__))
+if folder not in sys.path:
+    sys.path.insert(0, folder)
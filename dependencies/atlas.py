@@ -0,0 +1,102 @@
+from json import load
+from multiprocessing import Pool, cpu_count
+from os import path
+
+from numpy import linspace, memmap, ones, rint, uint16
+
+from functions import juliasamples
+from poster import checkpoint
+from stream import single
+
+atlasname = 'JuliaAtlas'              # file names the atlas is kept under, .iters for the tiles and .json for how far the build got
+atlasgrid = 96                        # c values along each side of the grid
+atlastile = 32                        # iterations along each side of a tile
+atlasiters = 100                      # iteration budget the tiles are computed with, the same as julialoop starts with
+atlasregion = (-2.0, 0.5, -1.25, 1.25) # minx, maxx, miny, maxy of the c values, covers the whole mandelbrot set
+atlasspan = 4.0                       # width and height of the z window every tile covers, centred on 0
+atlasinset = 24                       # cells wide the julia inset in the mandelbrot loop is drawn at
+
+
+def atlasparams():
+    '''the settings an atlas was built with, a build with different ones starts over'''
+    return {'grid': atlasgrid, 'tile': atlastile, 'iters': atlasiters, 'region': list(atlasregion), 'span': atlasspan}
+
+def atlasrow(job):
+    '''computes every tile with the j-th imaginary part of c and writes them straight into the file, runs in a pool worker'''
+    name, params, j = job
+    x0, x1, y0, y1 = params['region']
+    grid, tile, span = params['grid'], params['tile'], params['span']
+    tiles = memmap(name + '.iters', uint16, 'r+', shape = (grid, grid, tile, tile))
+    my = y0 + (y1 - y0) * j / (grid - 1.0)
+    for i, mx in enumerate(linspace(x0, x1, grid)):
+        tiles[i, j] = juliasamples(-.5 * span, .5 * span, -.5 * span, .5 * span, mx, my, params['iters'], tile, tile)
+    tiles.flush()
+    del tiles
+    return j
+
+def buildatlas(name = atlasname, workers = None):
+    '''computes the atlas on a process pool, rows are checkpointed as they finish so an interrupted build picks up where it stopped'''
+    from tqdm import tqdm
+    params = atlasparams()
+    state = None
+    if path.exists(name + '.iters') and path.exists(name + '.json'):
+        with open(name + '.json') as f:
+            state = load(f)
+        if state['params'] != params:
+            state = None # built with other settings
+    if state is None:
+        state = {'params': params, 'rows': [], 'complete': False}
+        memmap(name + '.iters', uint16, 'w+', shape = (atlasgrid, atlasgrid, atlastile, atlastile)).flush()
+        checkpoint(name + '.json', state)
+    jobs = [(name, params, j) for j in range(atlasgrid) if j not in state['rows']]
+    workers = max(1, min(workers or cpu_count(), len(jobs)))
+    pool = Pool(workers, single) if workers > 1 else None
+    try:
+        for j in tqdm((pool.imap_unordered if pool else map)(atlasrow, jobs), total = len(jobs)):
+            state['rows'].append(j)
+            state['complete'] = len(state['rows']) == atlasgrid
+            checkpoint(name + '.json', state)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return juliaAtlas(name)
+
+def loadatlas(name = atlasname):
+    '''the atlas if one has been built all the way, otherwise None'''
+    if not path.exists(name + '.iters') or not path.exists(name + '.json'):
+        return None
+    atlas = juliaAtlas(name)
+    return atlas if atlas.complete else None
+
+
+class juliaAtlas:
+    '''low resolution julia iterations for a grid of c values, memory mapped so only the tiles looked at get read'''
+    def __init__(self, name = atlasname):
+        with open(name + '.json') as f:
+            state = load(f)
+        params = state['params'] # the file's own settings so an atlas still reads after the constants change
+        self.complete = state['complete']
+        self.grid, self.tile, self.iters, self.span = params['grid'], params['tile'], params['iters'], params['span']
+        self.region = params['region']
+        self.tiles = memmap(name + '.iters', uint16, 'r', shape = (self.grid, self.grid, self.tile, self.tile))
+
+    def lookup(self, mx, my):
+        '''(tile, tile) iterations for c = mx + my i, bilinear between the four grid values around it, c outside the grid uses the edge'''
+        x0, x1, y0, y1 = self.region
+        fx = min(max((mx - x0) / (x1 - x0) * (self.grid - 1), 0), self.grid - 1)
+        fy = min(max((my - y0) / (y1 - y0) * (self.grid - 1), 0), self.grid - 1)
+        i, j = min(int(fx), self.grid - 2), min(int(fy), self.grid - 2)
+        tx, ty = fx - i, fy - j
+        t = self.tiles
+        return t[i, j] * ((1 - tx) * (1 - ty)) + t[i + 1, j] * (tx * (1 - ty)) + t[i, j + 1] * ((1 - tx) * ty) + t[i + 1, j + 1] * (tx * ty)
+
+    def view(self, mx, my, cx, cy, w, h, width, height):
+        '''(width, height) iterations for a julia view the way julialoop lays it out, nearest tile sample for each point,
+        points outside the tile window escape straight away'''
+        tile = self.lookup(mx, my)
+        xs = rint((linspace(cx - .5 * w, cx + .5 * w, width) + .5 * self.span) / self.span * (self.tile - 1)).astype(int)
+        ys = rint((linspace(cy - .5 * h, cy + .5 * h, height) + .5 * self.span) / self.span * (self.tile - 1)).astype(int)
+        inx, iny = (xs >= 0) & (xs < self.tile), (ys >= 0) & (ys < self.tile)
+        out = ones((width, height), uint16)
+        out[inx[:, None] & iny[None, :]] = rint(tile[xs[inx]][:, ys[iny]]).astype(uint16).ravel()
+        return out
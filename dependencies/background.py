@@ -0,0 +1,75 @@
+from threading import Condition, Thread
+
+previewsteps = (4, 2)  # cells per side of each preview sample, coarsest first, the full frame comes after them
+previewtime = .1       # seconds a frame has to look like it will take before previews get drawn first
+
+
+class Cancelled(Exception):
+    '''raised inside a render once a newer view has been asked for'''
+
+
+class renderThread:
+    '''draws views on a worker thread so the keyboard never waits on a frame, asking for a new view cancels the one being drawn
+
+    render(view, cancelled) draws one view and should check cancelled() as it goes, raising Cancelled once it returns True'''
+    def __init__(self, render):
+        self.render = render
+        self.lock = Condition()
+        self.view = None        # the next view to draw, only the newest one is kept so pending keypresses merge into it
+        self.generation = 0     # goes up with every view asked for, a render is stale once it has moved on
+        self.busy = False
+        self.closed = False
+        self.error = None       # anything a render raised besides Cancelled, raised again on the main thread
+        thread = Thread(target = self.run)
+        thread.daemon = True
+        thread.start()
+
+    def show(self, view):
+        '''asks for a view, replacing any that hasn't been started and cancelling the one being drawn'''
+        with self.lock:
+            self.view = view
+            self.generation += 1
+            self.lock.notify_all()
+        self.check()
+
+    def cancel(self):
+        '''stops drawing and waits for the worker to go idle, used before anything else writes to the terminal'''
+        with self.lock:
+            self.view = None
+            self.generation += 1
+            while self.busy:
+                self.lock.wait()
+        self.check()
+
+    def close(self):
+        '''cancels whatever is being drawn and lets the worker exit'''
+        self.cancel()
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+
+    def check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def run(self):
+        while 1:
+            with self.lock:
+                while self.view is None and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                view, generation = self.view, self.generation
+                self.view = None
+                self.busy = True
+            try:
+                self.render(view, lambda: generation != self.generation)
+            except Cancelled:
+                pass
+            except Exception as e:
+                self.error = e
+            finally:
+                with self.lock:
+                    self.busy = False
+                    self.lock.notify_all()
@@ -0,0 +1,139 @@
+from __future__ import print_function
+
+from decimal import Decimal, getcontext
+from json import loads
+from multiprocessing import Pool, cpu_count
+from time import time
+from traceback import format_exc
+
+from tqdm import tqdm
+
+import farm
+import functions
+import stream
+from colors import noiseColor
+from functions import (juliabudget, juliaimggen, juliapananim,
+                       mandelbudget, mandelimggen, mandeliteranim,
+                       mandelzoomanim)
+from perturb import refprec
+from poster import checkpoint
+
+jobtypes = ['image', 'zoom', 'iterations', 'juliapan']
+palettes = {'grayscale': 0, 'gnuplot': 1, 'noise': 2} # names a spec can use instead of the color mode number
+defaults = {'x': -.5, 'y': 0.0, 'w': 4.0, 'iters': 100, 'res': [1920, 1080], 'aa': 2, 'palette': 0, 'frames': 600, 'mode': 'Add', 'keep': False, 'smooth': False}
+
+
+def resolve(spec, marks):
+    '''fills a job spec in from its bookmark and the defaults so the manifest says exactly what was rendered'''
+    job = dict(defaults)
+    if 'bookmark' in spec:
+        job['x'], job['y'], job['w'], job['iters'] = marks[spec['bookmark']]
+    job.update(spec)
+    if job.get('type') not in jobtypes:
+        raise ValueError('unknown job type ' + str(job.get('type')) + ', expected one of ' + ', '.join(jobtypes))
+    job['palette'] = palettes.get(job['palette'], job['palette'])
+    if job['type'] == 'juliapan': # waypoints can be coordinates or bookmark names
+        job['waypoints'] = [list(p) if isinstance(p, list) else marks[p][:2] for p in job['waypoints']]
+    if 'noise' not in job: # noise colors are random, keeping the seeds lets a job be rendered again the same
+        noise = noiseColor()
+        job['noise'] = [noise.rand1, noise.rand2, noise.rand3, noise.scale]
+    return job
+
+def expand(specs, marks):
+    '''resolves a list of specs, a spec with "bookmark": "*" becomes one job per bookmark'''
+    jobs = []
+    for spec in specs:
+        if spec.get('bookmark') == '*':
+            for name in sorted(marks):
+                each = dict(spec)
+                each['bookmark'] = name
+                jobs.append(resolve(each, marks))
+        else:
+            jobs.append(resolve(spec, marks))
+    return jobs
+
+def cost(job):
+    '''rough relative cost of a job, the scheduler starts the biggest ones first so one doesn't run alone at the end'''
+    pixels = job['res'][0] * job['res'][1]
+    iters = 1000 if job['iters'] == 'auto' else job['iters'] # not known until the job runs
+    if job['type'] == 'image':
+        return pixels * job['aa'] ** 2 * iters
+    if job['type'] == 'iterations':
+        return pixels * 4 * iters
+    return pixels * job['frames'] * iters
+
+def renderjob(job):
+    '''renders one resolved job and returns its manifest entry, errors are recorded instead of raised so the rest of the batch carries on'''
+    start = time()
+    entry = {'job': job}
+    try:
+        noise = noiseColor()
+        noise.rand1, noise.rand2, noise.rand3, noise.scale = job['noise']
+        functions.keepiters = job['keep']
+        functions.smoothiters = job['smooth']
+        res = tuple(job['res'])
+        w = float(job['w'])
+        getcontext().prec = refprec(w)
+        cx, cy = Decimal(job['x']), Decimal(job['y']) # strings keep every digit of a deep coordinate
+        functions.autoiters = job['iters'] == 'auto' # zooms then work out every frame's budget, julia pans always run 5000
+        iters = job['iters']
+        if functions.autoiters and job['type'] in ('image', 'iterations'): # only these render at the budget of the view
+            if job['type'] == 'image' and 'julia' in job:
+                iters = juliabudget(cx, cy, w, (w * res[1]) / res[0], job['julia'][0], job['julia'][1])
+            else:
+                iters = mandelbudget(cx, cy, w, (w * res[1]) / res[0])
+            entry['iters'] = iters
+        if job['type'] == 'image' and 'julia' in job:
+            entry['output'] = juliaimggen(float(cx), float(cy), job['julia'][0], job['julia'][1], w, iters, res, job['palette'], noise, job['aa'], show = False)
+        elif job['type'] == 'image':
+            entry['output'] = mandelimggen(cx, cy, w, iters, res, job['palette'], noise, job['aa'], show = False)
+        elif job['type'] == 'zoom':
+            entry['output'] = mandelzoomanim(cx, cy, w, iters, res, job['frames'], job['palette'], noise)
+        elif job['type'] == 'iterations':
+            entry['output'] = mandeliteranim(cx, cy, w, iters, res, job['mode'], job['palette'], noise)
+        else:
+            entry['output'] = juliapananim(job['waypoints'], res, job['frames'], job['palette'], noise)
+        entry['status'] = 'done'
+    except Exception:
+        entry['status'] = 'failed'
+        entry['error'] = format_exc()
+    entry['seconds'] = round(time() - start, 3)
+    return entry
+
+def numbered(item):
+    '''runs renderjob inside a worker keeping track of which job it was'''
+    return item[0], renderjob(item[1])
+
+def worker():
+    '''every job gets one core, so the kernels get one thread and anything that would start its own pool renders in place'''
+    stream.single()
+    stream.poolworkers = 1
+
+def renderbatch(jobs, workers = None, manifest = None):
+    '''renders resolved jobs across a process pool and writes the manifest after every job so an interrupted batch still has a record'''
+    workers = max(1, min(workers or cpu_count(), len(jobs)))
+    if farm.farmaddress is not None:
+        workers = 1 # the farm is shared by the jobs, a pool of them would each try to listen on the port
+    entries = [{'job': job, 'status': 'pending'} for job in jobs]
+    order = sorted(range(len(jobs)), key = lambda i: -cost(jobs[i]))
+    pool = None
+    if workers > 1:
+        pool = Pool(workers, worker)
+        results = pool.imap_unordered(numbered, [(i, jobs[i]) for i in order])
+    else: # a single job at a time keeps every core for itself
+        results = (numbered((i, jobs[i])) for i in order)
+    try:
+        for i, entry in tqdm(results, total = len(jobs)):
+            entries[i] = entry
+            tqdm.write(str(i) + ' ' + entry['job']['type'] + ' ' + entry['status'] + ' in ' + str(entry['seconds']) + 's ' + str(entry.get('output', '')))
+            if manifest is not None:
+                checkpoint(manifest, entries)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return entries
+
+def runbatch(specs, workers = None, manifest = None, marks = 'Bookmarks.json'):
+    '''python entry point for batch rendering, specs is a list of job dicts and marks the bookmark file their names refer to'''
+    marks = loads(open(marks).read()) if any('bookmark' in spec or 'waypoints' in spec for spec in specs) else {}
+    return renderbatch(expand(specs, marks), workers, manifest)
@@ -0,0 +1,251 @@
+from __future__ import print_function
+
+import platform
+import sys
+from decimal import Decimal, getcontext
+from json import loads
+from multiprocessing import Process, Queue, cpu_count
+from time import strftime
+from timeit import default_timer
+
+import numba
+import numpy
+from numpy import float64
+
+import colors
+from colors import colorize, cols, noiseColor
+from functions import (aafour, aatwo, imgtrace, juliasamples,
+                       mandelimgiters, mandelsamples)
+from perturb import mandeldeep, refprec
+from terminal import frameEncoder
+
+try:
+    import tracemalloc
+except ImportError: # python 2, peak memory reads as 0 off linux
+    tracemalloc = None
+
+benchterm = (160, 48)   # terminal cells the loop stages are timed at, each cell is 2x2 samples
+benchimage = (640, 360) # resolution the image stages are timed at
+benchrepeats = 3        # each stage is run this many times and the fastest one kept
+benchtol = 0.1          # fraction a stage can get slower by before compare calls it a regression
+
+# fixed workloads next to the bookmarks, as (x, y, w, iters), coordinates are strings so deep ones keep their digits
+synthetic = {
+    'synthetic interior': ('-0.1', '0.05', 0.4, 2000),      # almost all of it inside the main cardioid
+    'synthetic deep': ('-0.743643887037158704752191506114774', '0.131825904205311970493132056385139', 1e-20, 3000),
+    'synthetic high iterations': ('-0.7453', '0.1127', 6.5e-4, 20000),
+}
+
+
+class nullStream:
+    '''stands in for stdout so the encoder can be timed without a terminal'''
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+def status(field):
+    '''a line of /proc/self/status such as VmRSS or VmHWM in MB, None off linux'''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+def resetpeak():
+    '''starts linux's peak resident memory over from what is resident now, False where that can't be done'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return status('VmHWM') is not None
+    except (IOError, OSError):
+        return False
+
+def timed(run):
+    '''best time over benchrepeats runs, returns the seconds, what the last run returned and how far memory went up over them in MB
+
+    the peak is started over for every stage so one stage can't report another's, on linux it is the resident memory and
+    counts the kernels' own allocations, elsewhere tracemalloc only sees what python and numpy allocate'''
+    if resetpeak():
+        before = status('VmRSS')
+        growth = lambda: status('VmHWM') - before
+    elif tracemalloc is not None:
+        tracemalloc.start()
+        growth = lambda: tracemalloc.get_traced_memory()[1] / 1048576.0
+    else:
+        growth = lambda: 0.0
+    try:
+        best = None
+        for i in range(benchrepeats):
+            start = default_timer()
+            out = run()
+            seconds = default_timer() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, out, growth()
+    finally:
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def worked(iters, maxiter):
+    '''iterations the escaped samples of a grid of counts took, every one of them really ran, the samples in the set are
+    left out as the bulb and cycle checks stop them after an unknown number of steps, so iters_per_s is a lower bound'''
+    escaped = iters[(iters != 0) & (iters < maxiter)]
+    return int(escaped.sum(dtype = float64))
+
+def stage(seconds, pixels, growth, iterations = None):
+    '''the numbers kept for a stage'''
+    result = {'seconds': round(seconds, 6), 'pixels_per_s': round(pixels / seconds, 1), 'peak_mb': round(growth, 2)}
+    if iterations is not None:
+        result['iters_per_s'] = round(iterations / seconds, 1)
+    return result
+
+def runcase(x, y, w, maxiter):
+    '''times every stage of one view, one stage failing doesn't stop the ones after it'''
+    getcontext().prec = refprec(w)
+    cx, cy = Decimal(x), Decimal(y)
+    noise = noiseColor()
+    results = {}
+
+    def record(name, run):
+        try:
+            results[name] = run()
+        except Exception as e:
+            results[name] = {'error': repr(e)}
+
+    def terminalcompute():
+        tw, th = benchterm
+        h = (w * th * 2) / tw
+        seconds, samples, growth = timed(lambda: mandelsamples(cx, cy, w, h, maxiter, tw * 2, th * 2))
+        results['_term'] = samples
+        return stage(seconds, tw * th * 4, growth, worked(samples, maxiter))
+
+    def imagecompute():
+        iw, ih = benchimage
+        h = (w * ih) / iw
+        seconds, out, growth = timed(lambda: mandelimgiters(cx, cy, w, h, maxiter, iw, ih))
+        results['_image'] = out
+        return stage(seconds, iw * ih, growth, worked(out, maxiter))
+
+    def colouring():
+        image = results['_image']
+        inside = image[image != 0]
+        minimum = inside.min() if len(inside) else 0
+        def run():
+            colors.tables.clear() # the table build is part of the cost
+            return colorize(image, cols(1, image.max() + 1, noise, minimum))
+        seconds, out, growth = timed(run)
+        return stage(seconds, image.size, growth)
+
+    def encoding(frame):
+        grid = aafour(results['_term']) if frame.rows == 1 else aatwo(results['_term'])
+        rgb = colorize(grid, cols(1, int(grid.max()) + 1, noise))
+        stdout = sys.stdout
+        sys.stdout = nullStream()
+        try:
+            def run():
+                frame.reset() # every cell gets sent
+                return frame.draw(rgb)
+            seconds, sent, growth = timed(run)
+        finally:
+            sys.stdout = stdout
+        result = stage(seconds, grid.size, growth)
+        result['bytes'] = sent
+        return result
+
+    record('terminal compute', terminalcompute)
+    record('image compute', imagecompute)
+    record('colouring', colouring)
+    record('encoding', lambda: encoding(frameEncoder(False, 'truecolor')))
+    record('half block encoding', lambda: encoding(frameEncoder(True, '256'))) # twice the pixels in the same cells
+    results.pop('_term', None)
+    results.pop('_image', None)
+    return results
+
+def isolated(queue, case):
+    '''runs a case in a child process so its peak memory isn't hidden by the cases before it'''
+    queue.put(runcase(*case))
+
+def warmup():
+    '''seconds each kernel takes on its first call, which is nearly all jit compilation'''
+    times = {}
+    tiny = numpy.linspace(-1, 1, 4)
+    kernels = [
+        ('mandelsamples', lambda: mandelsamples(-.5, 0, 3.0, 3.0, 50, 4, 4)),
+        ('juliasamples', lambda: juliasamples(-1.0, 1.0, -1.0, 1.0, -.8, .156, 50, 4, 4)),
+        ('imgtrace', lambda: imgtrace(tiny, tiny, False, 0.0, 0.0, 50, 4)),
+        ('mandeldeep', lambda: mandeldeep(Decimal('-1.75'), Decimal(0), 1e-15, 1e-15, 50, 4, 4)),
+    ]
+    for name, run in kernels:
+        start = default_timer()
+        try:
+            run()
+            times[name] = round(default_timer() - start, 4)
+        except Exception as e:
+            times[name] = {'error': repr(e)}
+    return times
+
+def runbench(marks = 'Bookmarks.json', only = None):
+    '''runs the suite over the bookmarks and the synthetic cases and returns the results as a dict for json'''
+    cases = dict(synthetic)
+    for name, (x, y, w, maxiter) in loads(open(marks).read()).items():
+        cases['bookmark ' + name] = (repr(x), repr(y), w, maxiter)
+    if only:
+        cases = dict((name, case) for name, case in cases.items() if any(o.lower() in name.lower() for o in only))
+    report = {
+        'meta': {'date': strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(), 'numpy': numpy.__version__,
+                 'numba': numba.__version__, 'cores': cpu_count(), 'machine': platform.machine(),
+                 'terminal': list(benchterm), 'image': list(benchimage), 'repeats': benchrepeats},
+        'warmup': warmup(), # compiles everything in this process so the cases below only time running
+        'cases': {},
+    }
+    for name in sorted(cases):
+        print(name, file = sys.stderr)
+        queue = Queue()
+        child = Process(target = isolated, args = (queue, cases[name]))
+        child.start()
+        child.join() # the results are small enough to sit in the queue until the child is done
+        report['cases'][name] = queue.get() if not queue.empty() else {'error': 'exit code ' + str(child.exitcode)}
+    return report
+
+def compare(old, new, tol = None):
+    '''lines describing how every stage moved between two reports and whether any of them regressed'''
+    tol = benchtol if tol is None else tol
+    lines = []
+    regressed = False
+    pairs = [('warmup ' + k, old['warmup'].get(k), new['warmup'][k]) for k in sorted(new['warmup'])]
+    for case in sorted(new['cases']):
+        for name in sorted(new['cases'][case]):
+            pairs.append((case + ' / ' + name, old['cases'].get(case, {}).get(name), new['cases'][case][name]))
+    # stages the new run never got to are compared against nothing, a crash or a dropped case shouldn't read as a pass
+    pairs += [('warmup ' + k, old['warmup'][k], {}) for k in sorted(old['warmup']) if k not in new['warmup']]
+    for case in sorted(old['cases']):
+        pairs += [(case + ' / ' + name, old['cases'][case][name], {}) for name in sorted(old['cases'][case]) if name not in new['cases'].get(case, {})]
+    for label, a, b in pairs:
+        if not isinstance(a, dict) and a is not None:
+            a = {'seconds': a} # warm-up entries are plain seconds
+        if not isinstance(b, dict):
+            b = {'seconds': b}
+        if a is not None and 'seconds' in a and 'seconds' not in b:
+            lines.append(label + ': ' + str(round(a['seconds'], 4)) + 's -> ' + ('failed' if 'error' in b else 'missing') + ' REGRESSION')
+            regressed = True
+            continue
+        if a is None or 'seconds' not in a or 'seconds' not in b:
+            lines.append(label + ': ' + ('failed' if 'error' in b else 'new'))
+            continue
+        ratio = b['seconds'] / max(a['seconds'], 1e-9)
+        status = 'same'
+        if ratio > 1 + tol:
+            status = 'REGRESSION'
+            regressed = True
+        elif ratio < 1 / (1 + tol):
+            status = 'faster'
+        line = label + ': ' + str(round(a['seconds'], 4)) + 's -> ' + str(round(b['seconds'], 4)) + 's (' + str(round(ratio, 2)) + 'x) ' + status
+        if b.get('peak_mb', 0) > max(a.get('peak_mb', 0), 1.0) * (1 + tol): # small peaks are mostly noise
+            line += ', peak memory ' + str(a.get('peak_mb', 0)) + 'MB -> ' + str(b['peak_mb']) + 'MB REGRESSION'
+            regressed = True
+        lines.append(line)
+    return lines, regressed
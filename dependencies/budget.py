@@ -0,0 +1,49 @@
+from numpy import arange, interp, linspace, maximum, meshgrid, sort
+
+budgetgrid = 48         # samples along the width of the sparse grid a budget is worked out from
+budgetmin = 100         # never picks fewer iterations than this, what the loops start with
+budgetmax = 20000       # nor more than this, samples still going at it are taken to be inside the set
+budgetshare = .995      # share of the escaping samples the budget has to let escape
+budgetmargin = 1.5      # room left over that, the pixels between the sparse samples can take a little longer
+budgetgrowth = 4        # what the cap gets multiplied by while the escape counts run up against it
+budgetkeys = 12         # widths along a zoom the budget is worked out at, the frames in between are interpolated
+
+
+def pickbudget(iters, cap):
+    '''the smallest budget that lets budgetshare of the escaping samples escape, None if the cap cut their counts off
+    so that can't be told yet, samples at the cap count as inside the set'''
+    escaped = sort(iters[iters < cap])
+    if not escaped.size:
+        return None
+    budget = int(escaped[int(budgetshare * (escaped.size - 1))] * budgetmargin)
+    return budget if budget < cap else None
+
+def autobudget(points, w, h, start = budgetmin):
+    '''iteration budget for a view w by h out of a sparse grid of samples, points(width, height, xs, ys, maxiter) returns the
+    iterations at columns xs and rows ys of a width by height grid over the view
+
+    the cap starts at start and goes up while the escape counts run up against it, only the samples still at the old cap
+    are iterated again each time'''
+    height = max(2, int(round(budgetgrid * h / w)))
+    xs, ys = meshgrid(arange(budgetgrid), arange(height))
+    xs, ys = xs.ravel(), ys.ravel()
+    cap = max(min(start, budgetmax), budgetmin)
+    iters = points(budgetgrid, height, xs, ys, cap)
+    budget = pickbudget(iters, cap)
+    while budget is None and cap < budgetmax:
+        left = iters >= cap
+        cap = min(cap * budgetgrowth, budgetmax)
+        if left.any():
+            iters[left] = points(budgetgrid, height, xs[left], ys[left], cap)
+        budget = pickbudget(iters, cap)
+    if budget is None: # nothing escaped even at budgetmax, or the counts still ran up against it
+        return budgetmax if (iters < cap).any() else budgetmin
+    return max(budget, budgetmin)
+
+def keybudgets(budget, keysw):
+    '''budget(w) worked out at budgetkeys widths of a zoom and spread over all its frames in between, never going
+    back down so detail doesn't come and go as the zoom goes deeper'''
+    frames = len(keysw)
+    picks = sorted(set(linspace(0, frames - 1, min(budgetkeys, frames)).round().astype(int)))
+    budgets = interp(range(frames), picks, [budget(keysw[i]) for i in picks])
+    return maximum.accumulate(budgets).round().astype(int)
@@ -1,42 +1,70 @@
+from collections import OrderedDict
 from random import random
 
-from matplotlib import cm
 from noise import pnoise1
-from numba import jit
-from numpy import uint8, zeros
+from numpy import arange, array, clip, floor, int64, uint8, zeros
 
-from java import remap
+cachesize = 32          # how many color tables cols keeps around
+tables = OrderedDict()  # least recently used first
 
 
-@jit(parallel=True, nogil=True)
-def colmap(c): return int(remap(c, 0, 1, 0, 255)) # just used to swap gradient from decimals to regular color values
+def periodic(choice, noise):
+    '''the repeating part of a color mode, gnuplot repeats every 512 iterations and noise every noise.scale'''
+    if choice == 1:
+        from matplotlib import cm # slow to import and only gnuplot needs it
+        k = (arange(512) + 256) % 512
+        return (cm.gnuplot2(abs(k * 2.0 / 512 - 1.0))[:, :3] * 255).astype(uint8) # one call to the colormap for the whole period
+    return array([noise.gencolor(i) for i in range(int(noise.scale))], uint8)
 
+def cached(key, build):
+    '''looks a table up in the lru cache, building and storing it if it isn't there'''
+    if key in tables:
+        colors = tables.pop(key)
+    else:
+        colors = build()
+        colors.flags.writeable = False # tables are shared between callers
+        if len(tables) >= cachesize:
+            tables.popitem(last = False)
+    tables[key] = colors
+    return colors
 
 def cols(choice, its, noise, miniters = 0, highlight = -1):
     '''Returns an array of colors mapped to iteration by index'''
+    its, miniters, highlight = int(its), int(miniters), int(highlight)
+    seeds = (noise.rand1, noise.rand2, noise.rand3, noise.scale) if choice == 2 else None # noise tables change with the seeds
+    return cached((choice, its, miniters, highlight, seeds), lambda: buildcols(choice, its, noise, miniters, highlight))
+
+def buildcols(choice, its, noise, miniters, highlight):
+    '''builds the table for cols with array operations'''
     colors = zeros((its, 3), uint8)
+    if choice == 1 or (choice == 2 and noise.scale == int(noise.scale)):
+        table = cached((choice, noise.rand1, noise.rand2, noise.rand3, noise.scale) if choice == 2 else (choice,), lambda: periodic(choice, noise))
+    elif choice == 2: # noise only repeats exactly when the scale is a whole number
+        table = array([noise.gencolor(i) for i in range(its)], uint8)
     # switches between highlighting individual iterations or just giving a color map
     if highlight == -1:
-        colors[0] = (0, 0, 0)
         if choice == 0:
-            for i in range(miniters, its): colors[i] = (int(remap(i, miniters, its, 0.0, 255.0)), int(remap(i, miniters, its, 0.0, 255.0)), int(remap(i, miniters, its, 0.0, 255.0)))
-            return colors
-        if choice == 1:
-            for i in range(1, its): colors[i] = (colmap(cm.gnuplot2(abs(remap(((i + 256) % 512), 0, 512, -1.0, 1.0)))[0]), colmap(cm.gnuplot2(abs(remap(((i + 256) % 512), 0, 512, -1.0, 1.0)))[1]), colmap(cm.gnuplot2(abs(remap(((i + 256) % 512), 0, 512, -1.0, 1.0)))[2]))
-            return colors
-        if choice == 2:
-            for i in range(1, its): colors[i] = noise.gencolor(i)
-            return colors
+            i = arange(miniters, its)
+            colors[miniters:its] = ((i - miniters) * 255.0 / (its - miniters)).astype(uint8)[:, None]
+        else:
+            colors[1:its] = table[arange(1, its) % len(table)]
+    elif choice == 0:
+        colors[highlight] = (255, 255, 255)
     else:
-        if choice == 0:
-            colors[highlight] = (255, 255, 255)
-            return colors
-        if choice == 1:
-            colors[highlight] = (colmap(cm.gnuplot2(abs(remap(((highlight + 256) % 512), 0, 512, -1.0, 1.0)))[0]), colmap(cm.gnuplot2(abs(remap(((highlight + 256) % 512), 0, 512, -1.0, 1.0)))[1]), colmap(cm.gnuplot2(abs(remap(((highlight + 256) % 512), 0, 512, -1.0, 1.0)))[2]))
-            return colors
-        if choice == 2:
-            colors[highlight] = noise.gencolor(highlight)
-            return colors
+        colors[highlight] = table[highlight % len(table)]
+    return colors
+
+def lookup(iters, colors):
+    '''colors[iters], continuous counts blend the two entries they fall between'''
+    if iters.dtype.kind != 'f':
+        return colors[iters]
+    low = clip(floor(iters), 0, len(colors) - 2).astype(int64)
+    t = clip(iters - low, 0, 1)[..., None]
+    return (colors[low] * (1 - t) + colors[low + 1] * t).astype(uint8)
+
+def colorize(iters, colors):
+    '''makes the (height, width, 3) image for fromarray out of a (width, height) iteration array in one gather'''
+    return lookup(iters.T, colors)
 
 class noiseColor:
     def __init__(self):
@@ -0,0 +1,237 @@
+from __future__ import print_function
+
+import sys
+from binascii import hexlify
+from collections import deque
+from itertools import count
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from os import getpid, urandom
+from socket import gethostname
+from threading import Condition, Thread
+from time import sleep, time
+from traceback import format_exc
+
+farmaddress = None      # (host, port) the coordinator listens on, None renders everything on this machine
+farmkey = None          # shared secret workers need to connect, every message is checked against it, made up and printed if not given
+farmahead = 3           # jobs handed out or finished early per connected worker, what keeps the coordinator's memory bounded
+farmretries = 3         # times a job can fail or lose its worker before the render gives up on it
+farmslow = 4.0          # times the median job time a job can run before an idle worker is given it as well
+farmtimeout = 300.0     # seconds a job can run before that happens when no job has finished to compare against
+farmretry = 1.0         # seconds a worker waits before trying to reach the coordinator again
+
+shared = {'farm': None}
+
+
+def parseaddress(text):
+    '''host:port for the command line, an empty host only listens on this machine, other machines need a host such as 0.0.0.0'''
+    host, port = text.rsplit(':', 1)
+    return (host or '127.0.0.1', int(port))
+
+def sharedfarm():
+    '''the coordinator for farmaddress, started the first time it is asked for and kept so workers stay connected between renders
+
+    connections carry pickles, which can run code, so there is no default key, one is made up and printed when none was given'''
+    global farmkey
+    if shared['farm'] is None:
+        if farmkey is None:
+            farmkey = hexlify(urandom(16))
+            print('workers need --key ' + farmkey.decode('ascii'), file = sys.stderr)
+        shared['farm'] = renderFarm(farmaddress, farmkey)
+    return shared['farm']
+
+
+class FarmError(Exception):
+    '''a job failed on every try, carries the last worker's traceback'''
+
+
+class renderFarm:
+    '''hands jobs out to workers connecting over sockets and gives the results back in order, jobs whose worker fails
+    or drops are handed out again and jobs running far longer than usual are given to a second worker as well'''
+    def __init__(self, address, authkey):
+        self.listener = Listener(address, authkey = authkey)
+        self.lock = Condition()
+        self.workers = 0        # connected right now
+        self.closed = False
+        self.generation = 0     # goes up with every map so answers to an old one get ignored
+        self.pending = deque()  # indexes waiting for a worker, retries go to the front
+        self.jobs = {}          # index to (task, args) for everything handed out and not yet given back
+        self.results = {}
+        self.running = {}       # index to (workers on it, when the first one started)
+        self.tries = {}
+        self.error = None
+        self.times = []         # seconds the finished jobs took, for telling when one is slow
+        thread = Thread(target = self.accept)
+        thread.daemon = True
+        thread.start()
+
+    def accept(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, EOFError, IOError, OSError):
+                continue # a bad key or a half open connection only costs that connection
+            thread = Thread(target = self.serve, args = (conn,))
+            thread.daemon = True
+            thread.start()
+
+    def slow(self):
+        '''seconds after which a running job gets a second worker'''
+        if not self.times:
+            return farmtimeout
+        return farmslow * sorted(self.times)[len(self.times) // 2]
+
+    def take(self):
+        '''the next job for a worker, waits while there is nothing to do, None once the farm is closed'''
+        with self.lock:
+            while not self.closed:
+                if self.pending:
+                    index = self.pending.popleft()
+                    if index not in self.jobs:
+                        continue # left over from a map given up on
+                else:
+                    limit = time() - self.slow()
+                    late = [i for i, (busy, start) in self.running.items() if busy == 1 and start < limit and i in self.jobs]
+                    if not late:
+                        self.lock.wait(.5) # wakes up now and then to look for slow jobs
+                        continue
+                    index = min(late)
+                busy, start = self.running.get(index, (0, time()))
+                self.running[index] = (busy + 1, start)
+                return self.generation, index, self.jobs[index]
+        return None
+
+    def finish(self, generation, index, ok, value, took):
+        '''records what a worker sent back, the first answer for a job wins'''
+        with self.lock:
+            if generation != self.generation or index not in self.jobs:
+                return # from an earlier map or already answered by another worker
+            busy, start = self.running.pop(index)
+            if ok:
+                self.results[index] = value
+                del self.jobs[index]
+                self.times.append(took)
+            elif busy > 1: # another worker is still on it
+                self.running[index] = (busy - 1, start)
+            else:
+                self.tries[index] = self.tries.get(index, 0) + 1
+                if self.tries[index] >= farmretries:
+                    self.error = FarmError('job ' + str(index) + ' failed ' + str(farmretries) + ' times, last error:\n' + str(value))
+                else:
+                    self.pending.appendleft(index)
+            self.lock.notify_all()
+
+    def serve(self, conn):
+        '''talks to one worker for as long as it stays connected'''
+        try:
+            conn.recv() # the worker introduces itself
+        except (EOFError, IOError, OSError):
+            return
+        with self.lock:
+            self.workers += 1
+            self.lock.notify_all()
+        try:
+            while 1:
+                job = self.take()
+                if job is None:
+                    conn.send(('done',)) # closing, anything wrong with the connection is no longer a problem
+                    return
+                generation, index, (task, args) = job
+                start = time()
+                try:
+                    conn.send(('job', index, task, args))
+                    while not conn.poll(.5):
+                        if self.closed:
+                            return
+                    answer = conn.recv()
+                except (EOFError, IOError, OSError):
+                    self.finish(generation, index, False, 'worker dropped the connection', 0)
+                    return
+                self.finish(generation, index, answer[0] == 'result', answer[2], time() - start)
+        except (EOFError, IOError, OSError):
+            pass
+        finally:
+            conn.close()
+            with self.lock:
+                self.workers -= 1
+
+    def map(self, task, jobs):
+        '''yields task(*args) for every args in jobs in order, computed on the workers, jobs is read as the workers catch up'''
+        jobs = iter(jobs)
+        with self.lock:
+            self.generation += 1
+            self.pending.clear()
+            self.jobs, self.results, self.running, self.tries, self.error, self.times = {}, {}, {}, {}, None, []
+        issued = 0
+        waiting = False
+        try:
+            for index in count():
+                with self.lock:
+                    while 1:
+                        # more jobs go out while there is room, reading them can take a while so the lock is let go for it
+                        while jobs is not None and issued < index + farmahead * max(self.workers, 1):
+                            self.lock.release()
+                            try:
+                                args = next(jobs, None)
+                            finally:
+                                self.lock.acquire()
+                            if args is None:
+                                jobs = None
+                            else:
+                                self.jobs[issued] = (task, args)
+                                self.pending.append(issued)
+                                issued += 1
+                                self.lock.notify_all()
+                        if self.error is not None:
+                            raise self.error
+                        if index in self.results or index >= issued:
+                            break
+                        if not self.workers and not waiting:
+                            print('waiting for workers on ' + str(self.listener.address[0]) + ':' + str(self.listener.address[1]), file = sys.stderr)
+                            waiting = True
+                        self.lock.wait(.5)
+                    if index >= issued:
+                        return
+                    result = self.results.pop(index)
+                yield result
+        finally: # a map given up on early leaves nothing for the workers to pick up
+            with self.lock:
+                self.pending.clear()
+                self.jobs, self.running, self.tries = {}, {}, {}
+
+    def close(self):
+        '''tells the workers the coordinator is done, they go back to waiting for the next one'''
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        self.listener.close()
+
+
+def work(address, authkey, once = False):
+    '''runs jobs for a coordinator, reconnecting whenever it goes away so one worker serves render after render'''
+    while 1:
+        try:
+            conn = Client(address, authkey = authkey)
+        except (EOFError, IOError, OSError):
+            if once:
+                raise
+            sleep(farmretry)
+            continue
+        try:
+            conn.send(('ready', gethostname(), getpid()))
+            message = conn.recv()
+            while message[0] == 'job':
+                index, task, args = message[1:]
+                try:
+                    answer = ('result', index, task(*args))
+                except Exception:
+                    answer = ('error', index, gethostname() + ' ' + str(getpid()) + '\n' + format_exc())
+                conn.send(answer)
+                message = conn.recv()
+        except (EOFError, IOError, OSError):
+            pass # the coordinator closed or crashed
+        finally:
+            conn.close()
+        if once:
+            return
+        sleep(farmretry)
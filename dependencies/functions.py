@@ -2,107 +2,121 @@ from __future__ import print_function
 
 import sys
 import tty
-from json import dumps, loads
-from math import floor, log10, sqrt
+from decimal import Decimal, getcontext
+from math import floor, log10, pi, sqrt
 from os import mkdir, path, popen, remove, system
 from time import sleep
 
-from imageio import get_writer, imread, imwrite, mimsave
-from matplotlib import cm
-from numba import autojit, jit, prange
-from numpy import (array, clip, empty, fliplr, float64, linspace, logspace,
-                   percentile, ravel, remainder, swapaxes, uint8, uint16,
-                   zeros)
-from pick import pick
-from PIL import Image, ImageFilter
-from tqdm import tqdm
-from colors import noiseColor, cols
-
-
-@jit(parallel=True, nopython=True, nogil=True)
-def juliafact(x, y, mx, my, iterations):
-    '''does julia factorization for a given point up to a certain number of iterations'''
-    # standard julia set function
-    n = 1
-    while n < iterations and x * x + y * y < 4.0:
-        aa = x * x - y * y
-        bb = 2 * x * y
-        x = aa + mx
-        y = bb + my
-        n += 1
-    return n
-
-@jit(parallel=True, nogil=True)
-def juliafast(minx, maxx, miny, maxy, mandelx, mandely, maxiter, width, height):
-    '''returns an \'antialiased\' list of iters for the julia set'''
-    # initializing arrays for:
-    iterxl = empty((width * 2, height * 2), uint16)  # larger iteration array
-    iters = empty((width, height), uint16)			# final iteration array
-    xspace = linspace(minx, maxx, width * 2, dtype=float64)		# faster to access xcoords
-    yspace = linspace(miny, maxy, height * 2, dtype=float64)		# faster to access ycoords
-
-    for x in range(width * 2):
-        for y in range(height * 2):
-            # generating initial iterations
-            iterxl[x, y] = juliafact(xspace[x], yspace[y], mandelx, mandely, maxiter)
-
-    for x in range(width):
-        for y in range(height):
-            x2 = x * 2
-            y2 = y * 2
-            iters[x, y] = int(iterxl[x2, y2] +
-                              iterxl[x2 + 1, y2] +
-                              iterxl[x2 + 1, y2 + 1] +
-                              iterxl[x2, y2 + 1] / 4)  # quick and dirty antialiasing just averages nearby values
-    return iters
-
-@jit(parallel=True, nopython=True, nogil=True)
-def mandelfact(x, y, iterations):
-    '''does mandelbrot factorization for a given point up to a certain number of iterations'''
-    # optimization to avoid calculations for the main and secondary bulbs
-    q = ((x - .25) ** 2) + (y ** 2)
-    if q * (q + x - .25) < .25 * y ** 2:
-        return iterations
-    if (x + 1) ** 2 + y ** 2 <= 1/16.0:
-        return iterations
-    # basic mandelbrot function implementation no optimizations other than putting the exponent check in the while loop to avoid an extra if
-    ca = x
-    cb = y
-    n = 1
-    while n < iterations and x * x + y * y < 4.0:
-        aa = x * x - y * y
-        bb = 2 * x * y
-        x = aa + ca
-        y = bb + cb
-        n += 1
-    return n
-
-@jit(parallel=True, nogil=True)
-def mandelfast(minx, maxx, miny, maxy, maxiter, width, height):
-    '''returns an \'antialiased\' list of iters for the mandelbrot set'''
-    # initializing arrays for:
-    iterxl = empty((width * 2, height * 2), uint16)  # larger iteration array
-    iters = empty((width, height), uint16)			# final iteration array
-    xspace = linspace(minx, maxx, width * 2, dtype=float64)		# faster to access xcoords
-    yspace = linspace(miny, maxy, height * 2, dtype=float64)		# faster to access ycoords
-
-    # generating initial iterations
-    for x in range(width * 2):
-        for y in range(height * 2):
-            iterxl[x, y] = mandelfact(xspace[x], yspace[y], maxiter)
-
-    for x in range(width):
-        for y in range(height):
-            x2 = x * 2
-            y2 = y * 2
-            iters[x, y] = int(iterxl[x2, y2] +
-                              iterxl[x2 + 1, y2] +
-                              iterxl[x2 + 1, y2 + 1] +
-                              iterxl[x2, y2 + 1] / 4)  # quick and dirty antialiasing just averages nearby values
-    return iters
+from numba import jit, prange
+from numpy import (arange, arctan2, argsort, array, clip, concatenate, cos,
+                   empty, exp, fliplr, float64, hypot, int64, linspace, log,
+                   logspace, maximum, percentile, ravel, remainder, rint,
+                   searchsorted, sin, spacing, swapaxes, uint8, uint16,
+                   unique, zeros)
+from budget import autobudget, keybudgets
+from colors import colorize, cols, noiseColor
+from iterstore import iterWriter, storename
+from kernels import (ddpoints, ddwidth, escapegrid, escapegriddd,
+                     escapepoints, escapespace, escapespacedd, iterdtype,
+                     juliafact, kernellock, mandelfact, smoothgrid,
+                     smoothpoints, smoothspace)
+from perturb import deeppoints, deepwidth, mandeldeep, mandeldeepat, refprec
+import farm
+from poster import dispatch, posterimg
+from stream import poolframes, writeframes
+
+try:
+    ask = raw_input
+except NameError: # python 3 renamed raw_input to input
+    ask = input
+
+subdivide = True        # images fill rectangles whose border has a single iteration count instead of iterating every pixel
+checksubdivide = False  # also renders images the brute force way and reports every pixel where the two disagree
+tracetile = 128         # size of the blocks the subdivision starts from, each one goes to its own core
+cycletol = 1e-3         # fraction of the pixel spacing an orbit has to come back within to count as caught in a cycle
+keepframes = False      # also saves every animation frame as a png in the cache folders
+keepiters = False       # also saves the iterations behind every image and animation next to it so mandelrecolor can color them again
+autoiters = False       # the loops and zoom animations work their iteration budget out from each view instead of using the one given
+smoothiters = False     # images are rendered with continuous escape counts so the palette blends instead of banding
+expzoom = True          # zoom animations are resampled from one exponential map of the whole zoom instead of rendering every frame
+tilemargin = 4          # pixels around a tile resized along with it, the LANCZOS filter reaches 3 pixels out at half size
+stepulps = 4            # float64 ulps of the centre the samples of a view have to be apart for it to stay in float64
+
+def precision(w, julia, samples = None, at = 0):
+    '''the cheapest arithmetic that still tells the samples of a view w wide apart, float64 down to deepwidth and past that
+    perturbation for the mandelbrot set, which beats double-double there, or double-double for julia sets, which have no reference orbit
+    and nothing past ddwidth either, given the samples across w and the largest coordinate at of the centre a view also leaves
+    float64 once its samples come within stepulps ulps of at, which big or supersampled images reach well before deepwidth'''
+    if w >= deepwidth and (samples is None or w / samples >= stepulps * spacing(abs(float(at)))):
+        return 'double'
+    if not julia:
+        return 'perturbation'
+    if w < ddwidth:
+        raise ValueError('julia views narrower than ' + str(ddwidth) + ' are past double-double, this one is ' + str(w))
+    return 'doubledouble'
+
+def juliaview(cx, cy, w, h, mx, my, maxiter, width, height, vieww = None, viewsize = None, progress = None):
+    '''raw iterations per sample for a julia view centred on cx, cy, which can be Decimal, at the precision the view needs, vieww and viewsize as in mandelsamples'''
+    vieww, viewsize = (w, width) if vieww is None else (vieww, viewsize)
+    if precision(vieww, True, viewsize, max(abs(cx), abs(cy))) == 'double':
+        return juliasamples(float(cx) - .5 * w, float(cx) + .5 * w, float(cy) - .5 * h, float(cy) + .5 * h, mx, my, maxiter, width, height, progress)
+    return escapegriddd(cx, cy, w, h, True, mx, my, maxiter, width, height, w / width * cycletol, progress)
+
+def juliapoints(cx, cy, w, h, mx, my, maxiter, width, height, xs, ys, vieww = None):
+    '''mandelpoints for the grid juliaview makes'''
+    vieww = w if vieww is None else vieww
+    if precision(vieww, True, width, max(abs(cx), abs(cy))) == 'double':
+        minx, maxx, miny, maxy = float(cx) - .5 * w, float(cx) + .5 * w, float(cy) - .5 * h, float(cy) + .5 * h
+        return escapepoints(linspace(minx, maxx, width)[xs], linspace(miny, maxy, height)[ys], True, mx, my, maxiter, (maxx - minx) / width * cycletol)
+    return ddpoints(cx, cy, linspace(-.5 * w, .5 * w, width)[xs], linspace(-.5 * h, .5 * h, height)[ys], True, mx, my, maxiter, w / width * cycletol)
+
+def juliabudget(cx, cy, w, h, mx, my):
+    '''mandelbudget for the julia set of mx, my'''
+    return autobudget(lambda width, height, xs, ys, maxiter: juliapoints(cx, cy, w, h, mx, my, maxiter, width, height, xs, ys), w, h)
+
+def juliasamples(minx, maxx, miny, maxy, mandelx, mandely, maxiter, width, height, progress = None):
+    '''returns the raw iterations per sample for the julia set, gets averaged down by aafour, progress as in escapegrid'''
+    return escapegrid(minx, maxx, miny, maxy, True, mandelx, mandely, maxiter, width, height, (maxx - minx) / width * cycletol, progress = progress)
+
+def aafour(iterxl):
+    '''brings a grid of samples down to half size, the mean of each 2x2 block in the grid's own dtype'''
+    wide = float64 if iterxl.dtype.kind == 'f' else int64 # four counts near the top of the dtype would wrap in it
+    total = iterxl[0::2, 0::2].astype(wide) + iterxl[1::2, 0::2] + iterxl[1::2, 1::2] + iterxl[0::2, 1::2]
+    return (total / 4 if wide is float64 else total // 4).astype(iterxl.dtype)
+
+def aatwo(iterxl):
+    '''brings a grid of samples down to half width only, a half block cell shows the two samples down it as two pixels'''
+    return (iterxl[0::2] >> 1) + (iterxl[1::2] >> 1) + (iterxl[0::2] & iterxl[1::2] & 1) # halves first so the sum stays inside the dtype
+
+def mandelsamples(cx, cy, w, h, maxiter, width, height, vieww = None, viewsize = None, progress = None):
+    '''raw iterations per sample, switches to perturbation once float64 runs out, vieww is the width of the whole view if this is only a strip
+    of it and viewsize the samples across it, so every strip of a view gets the same arithmetic
+
+    progress is called between chunks of columns as in escapegrid, the perturbation engine runs in one go without it'''
+    vieww, viewsize = (w, width) if vieww is None else (vieww, viewsize)
+    if precision(vieww, False, viewsize, max(abs(cx), abs(cy))) == 'double':
+        return mandelsamples64(float(cx) - .5 * w, float(cx) + .5 * w, float(cy) - .5 * h, float(cy) + .5 * h, maxiter, width, height, progress)
+    return mandeldeep(cx, cy, w, h, maxiter, width, height, vieww = vieww)
+
+def mandelpoints(cx, cy, w, h, maxiter, width, height, xs, ys, vieww = None):
+    '''the samples at columns xs and rows ys of the grid mandelsamples makes for the same view, computed without the rest of it'''
+    vieww = w if vieww is None else vieww
+    if precision(vieww, False, width, max(abs(cx), abs(cy))) == 'double':
+        minx, maxx, miny, maxy = float(cx) - .5 * w, float(cx) + .5 * w, float(cy) - .5 * h, float(cy) + .5 * h
+        return escapepoints(linspace(minx, maxx, width)[xs], linspace(miny, maxy, height)[ys], False, 0.0, 0.0, maxiter, (maxx - minx) / width * cycletol)
+    return deeppoints(Decimal(cx), Decimal(cy), linspace(-.5 * w, .5 * w, width)[xs], linspace(-.5 * h, .5 * h, height)[ys], maxiter, refprec(vieww))
+
+def mandelbudget(cx, cy, w, h):
+    '''the iterations a mandelbrot view w by h needs, worked out by autobudget from a sparse grid of it'''
+    return autobudget(lambda width, height, xs, ys, maxiter: mandelpoints(cx, cy, w, h, maxiter, width, height, xs, ys), w, h)
+
+def mandelsamples64(minx, maxx, miny, maxy, maxiter, width, height, progress = None):
+    '''returns the raw iterations per sample for the mandelbrot set'''
+    return escapegrid(minx, maxx, miny, maxy, False, 0.0, 0.0, maxiter, width, height, (maxx - minx) / width * cycletol, progress = progress)
 
 def mandelimg(cx, cy, w, iters, colchoice, noise):
     '''used to call mandelimggen with all variables, also provides selection to choose resolution'''
+    from pick import pick
     system('reset')
     title = "Pick a resolution for the rendered image:"
     options = [(1920, 1080), (2560, 1440), (3840, 2160),
@@ -110,9 +124,9 @@ def mandelimg(cx, cy, w, iters, colchoice, noise):
     choice = pick(options, title)[0]
     if choice == 'Custom':
         try:
-            width = int(raw_input("Width: "))
-            height = int(raw_input("Height: "))
-            aa = int(raw_input("AA Samples: "))
+            width = int(ask("Width: "))
+            height = int(ask("Height: "))
+            aa = int(ask("AA Samples: "))
             mandelimggen(cx, cy, w, iters, (width, height), colchoice, noise, aa)
         except ValueError:
             print("Input numbers only", end = '')
@@ -121,95 +135,274 @@ def mandelimg(cx, cy, w, iters, colchoice, noise):
         pass
     else:
         try:
-            aa = int(raw_input("AA Samples: "))
+            aa = int(ask("AA Samples: "))
             mandelimggen(cx, cy, w, iters, choice, colchoice, noise, aa)
         except ValueError:
             print("Input numbers only", end = '')
             sleep(1)
     tty.setraw(sys.stdin)
 
-def mandelimggen(cx, cy, w, maxiters, res, number, noise, aa):
-    '''used to make the images when the user requests it can't be jit compiled because of PIL'''
+def imagefuncs(view):
+    '''the samples and points functions posterimg renders an image with, out of a tuple that can be sent to a farm worker,
+    ('mandel', cx, cy, w, maxiters, res, aa, smooth, decimal precision) or ('julia', cx, cy, mx, my, w, maxiters, res, aa, smooth, decimal precision),
+    smooth only reaches the float64 kernels, the deeper ones give whole counts that go into the float store as they are'''
+    getcontext().prec = view[-1] # the same digits on a worker as where the render was started
+    if view[0] == 'julia':
+        cx, cy, mx, my, w, maxiters, res, aa, smooth = view[1:-1]
+    else:
+        cx, cy, w, maxiters, res, aa, smooth = view[1:-1]
     h = (float(w) * float(res[1])) / float(res[0])
-    minx = cx - .5 * w
-    maxx = cx + .5 * w
-    miny = cy - .5 * h
-    maxy = cy + .5 * h
-    # generates the values for iterations per pixel
-    iters = mandelimgfast(minx, maxx, miny, maxy, maxiters * 2, res[0] * aa, res[1] * aa)
-    iters %= maxiters * 2
-    maximum = iters.max()
-    # making the list of colors for faster access while making image
-    colors = cols(number, maximum + 1, noise, iters[iters != 0].min())
-
-    image = itertoimage(iters, colors)
-
-    img = Image.fromarray(image, "RGB")
-
-    img.resize((res[0], res[1]), Image.LANCZOS).save(str('./images/' + str((ndec(cx), ndec(cy))) + ' ' + str(ndec(w)) + ' ' + str(res) + '.png')) # saves image as coords, width and iters
-    img.resize((res[0], res[1]), Image.LANCZOS).show()
-
-@jit(parallel=True, nogil=True)
-def mandelimgfast(minx, maxx, miny, maxy, maxiter, width, height):
-    '''different than the other mandelfast as this one just provides the pixel values which get cleaned by antialiasing later'''
-    iters = empty((width, height), uint16) # makes empty array to populate with iterations
-    xspace = linspace(minx, maxx, width, dtype=float64)     # creates real values for quick access
-    yspace = linspace(miny, maxy, height, dtype=float64)    # creates imaginary values for quick access
-    for x in tqdm(range(width)):
-        for y in range(height):
-            iters[x, y] = mandelfact(xspace[x], yspace[y], maxiter)
+    columns, rows = res[0] * aa, res[1] * aa
+    tier = precision(w, view[0] == 'julia', columns, max(abs(cx), abs(cy))) # the spacing of the supersamples counts, not just the width
+    # every tile and point takes its samples out of these linspaces over the whole image, so tiling can't move a sample
+    if tier == 'double':
+        xspace = linspace(float(cx) - .5 * w, float(cx) + .5 * w, columns)
+        yspace = linspace(float(cy) - .5 * h, float(cy) + .5 * h, rows)
+        eps = (xspace[-1] - xspace[0]) / columns * cycletol # what mandelimgiters gives a single render of the image
+    else: # offsets from the centre so deep renders keep their precision
+        xspace = linspace(-.5 * w, .5 * w, columns)
+        yspace = linspace(-.5 * h, .5 * h, rows)
+        eps = w / columns * cycletol
+    along = lambda space, start, count, stride: space[start:start + (count - 1) * stride + 1:stride].copy() # contiguous like a linspace
+    if view[0] == 'julia' and tier == 'double':
+        def tile(x, y, width, height, stride = 1):
+            return juliaimgspace(along(xspace, x, width, stride), along(yspace, y, height, stride), mx, my, maxiters * 2, eps, smooth) % (maxiters * 2)
+        def points(xs, ys):
+            return (smoothpoints if smooth else escapepoints)(xspace[xs], yspace[ys], True, mx, my, maxiters * 2, eps) % (maxiters * 2)
+        return tile, points
+    if view[0] == 'julia':
+        def tile(x, y, width, height, stride = 1):
+            return escapespacedd(cx, cy, along(xspace, x, width, stride), along(yspace, y, height, stride), True, mx, my, maxiters * 2, eps) % (maxiters * 2)
+        def points(xs, ys):
+            return ddpoints(cx, cy, xspace[xs], yspace[ys], True, mx, my, maxiters * 2, eps) % (maxiters * 2)
+        return tile, points
+    deep = tier == 'perturbation'
+    def tile(x, y, width, height, stride = 1):
+        if deep: # the image's centre as the reference and its corner for the series, the same as mandeldeep over the whole image
+            return mandeldeepat(Decimal(cx), Decimal(cy), along(xspace, x, width, stride), along(yspace, y, height, stride), maxiters * 2, refprec(w),
+                                sqrt(.25 * w * w + .25 * h * h)) % (maxiters * 2)
+        return mandelimgspace(along(xspace, x, width, stride), along(yspace, y, height, stride), maxiters * 2, eps, smooth)
+    def points(xs, ys):
+        if deep:
+            return deeppoints(Decimal(cx), Decimal(cy), xspace[xs], yspace[ys], maxiters * 2, refprec(w)) % (maxiters * 2)
+        return (smoothpoints if smooth else escapepoints)(xspace[xs], yspace[ys], False, 0.0, 0.0, maxiters * 2, eps) % (maxiters * 2)
+    return tile, points
+
+def imagetask(view, kind, args):
+    '''one of posterimg's calls for a view, what farm workers run for an image'''
+    tile, points = imagefuncs(view)
+    return dispatch(tile, points, kind, args)
+
+def imagedtype(maxiters, smooth):
+    '''what posterimg keeps an image's iterations in, continuous counts as float32 and whole ones as narrow as maxiters allows'''
+    return 'float32' if smooth else iterdtype(maxiters * 2).__name__
+
+def farmcalls(view):
+    '''posterimg's remote for a view when a render farm is set up, otherwise None so everything runs here'''
+    if farm.farmaddress is None:
+        return None
+    return lambda calls: farm.sharedfarm().map(imagetask, ((view, kind, args) for kind, args in calls))
+
+def mandelimggen(cx, cy, w, maxiters, res, number, noise, aa, show = True):
+    '''used to make the images when the user requests it, renders in tiles so only a tile of it is ever in memory, returns the file name'''
+    from PIL import Image
+    view = ('mandel', cx, cy, w, maxiters, tuple(res), aa, smoothiters, refprec(w)) # the digits the view needs, not whatever this thread's context has
+    tile, points = imagefuncs(view)
+    name = str('./images/' + str((ndec(cx), ndec(cy))) + ' ' + str(ndec(w)) + ' ' + str(res) + '.png') # saves image as coords, width and iters
+    keep = (storename(name), {'set': 'mandelbrot', 'x': str(cx), 'y': str(cy), 'w': repr(w), 'iters': maxiters}) if keepiters else None
+    posterimg(tile, res, aa, number, noise, name, [str(cx), str(cy), repr(w), maxiters, aa], points, keep, farmcalls(view), imagedtype(maxiters, smoothiters))
+    if show:
+        Image.open(name).show()
+    return name
+
+def mandelimgfast(xspace, yspace, maxiter, eps):
+    '''just provides the pixel values which get cleaned by antialiasing later'''
+    from tqdm import tqdm
+    with tqdm(total = xspace.shape[0]) as bar: # advanced between chunks of columns, the kernel itself can't call back into python
+        iters = escapespace(xspace, yspace, False, 0.0, 0.0, maxiter, eps, progress = bar.update)
     return iters % maxiter # sets maxiters to 0 for quicker coloration of max vals
 
-def mandelzoom(cx, cy, w, maxiters, res, number, choice, noise):
-    '''generates image for zoom animation'''
-    h = (float(w) * float(res[1])) / float(res[0])
-    minx = cx - .5 * w
-    maxx = cx + .5 * w
-    miny = cy - .5 * h
-    maxy = cy + .5 * h
-    # generates the values for iterations per pixel
-    iters = mandelimgfast(minx, maxx, miny, maxy, maxiters, res[0], res[1])
-    maximum = iters.max()
-    # making the list of colors for faster access while making image
-    colors = cols(choice, int(maximum + 1), noise, iters[iters != 0].min())
-
-    image = itertoimage(iters, colors)
-
-    img = Image.fromarray(image, "RGB")
+def mandelimgiters(cx, cy, w, h, maxiter, width, height, vieww = None, smooth = False):
+    '''picks between subdivision, mandelimgfast and the perturbation engine depending on how deep the view is, vieww as in mandelsamples,
+    smooth gives continuous counts where float64 is enough'''
+    samples = width if vieww is None else None # a strip can't tell how many samples the whole view has
+    vieww = w if vieww is None else vieww
+    if precision(vieww, False, samples, max(abs(cx), abs(cy))) == 'perturbation':
+        return mandeldeep(cx, cy, w, h, maxiter, width, height, vieww = vieww) % maxiter
+    minx, maxx = float(cx) - .5 * w, float(cx) + .5 * w
+    miny, maxy = float(cy) - .5 * h, float(cy) + .5 * h
+    return mandelimgspace(linspace(minx, maxx, width), linspace(miny, maxy, height), maxiter, (maxx - minx) / width * cycletol, smooth)
+
+def mandelimgspace(xspace, yspace, maxiter, eps, smooth = False):
+    '''the float64 half of mandelimgiters over the points of xspace by yspace with cycle tolerance eps'''
+    if smooth: # continuous counts never give a border of one value, there is nothing for the subdivision to fill
+        return smoothspace(xspace, yspace, False, 0.0, 0.0, maxiter, eps) % maxiter
+    if not subdivide:
+        return mandelimgfast(xspace, yspace, maxiter, eps)
+    iters = imgtrace(xspace, yspace, False, 0.0, 0.0, maxiter, tracetile, eps) % maxiter
+    if checksubdivide:
+        tracecompare(iters, mandelimgfast(xspace, yspace, maxiter, eps))
+    return iters
 
-    img.save(str('./zoomcache/' + str(number) + '.png'))
+def mandelzoom(cx, cy, w, maxiters, res):
+    '''generates the iterations for a frame of the zoom animation'''
+    h = (float(w) * float(res[1])) / float(res[0])
+    return mandelimgiters(cx, cy, w, h, maxiters, res[0], res[1])
 
-def mandeliter(cx, cy, w, maxiters, res, choice, noise, mode):
-    '''generates images for iteration animation'''
+def framecolor(iters, choice, noise, highlight = -1):
+    '''colors one frame of iterations, the colors stretch from the lowest escaped iteration to the highest'''
+    escaped = iters[iters != 0]
+    # making the list of colors for faster access while making image
+    colors = cols(choice, int(iters.max() + 1), noise, escaped.min() if escaped.size else 0, highlight)
+    return colorize(iters, colors)
+
+def colorframes(frames, choice, noise, keep = None):
+    '''colors a stream of iteration frames, keep is the file name and metadata to also save the iterations under'''
+    store = iterWriter(*keep) if keep is not None else None
+    count = 0
+    for iters in frames:
+        if store is not None:
+            store.add('frame_%05d' % count, iters)
+        count += 1
+        yield framecolor(iters, choice, noise)
+    if store is not None:
+        store.close(frames = count)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def expstrip64(iters, cx, cy, r0, width, v0, v1, mrows):
+    '''fills iters with rows v0 to v1 of the exponential map, row v is the circle of radius r0 * exp(-2 pi v / width) around cx, cy'''
+    for u in prange(width):
+        t = 2 * pi * u / width
+        for v in range(v0, v1):
+            r = r0 * exp(-2 * pi * v / width)
+            iters[u, v - v0] = mandelfact(cx + r * cos(t), cy + r * sin(t), mrows[v - v0], 2 * pi * r / width * cycletol)
+
+def exprows(cx, cy, r0, width, v0, v1, mrows):
+    '''rows of the exponential map with points caught at their row's iteration budget set to 0, rows past float64 go through perturbation'''
+    r = r0 * exp(-2 * pi * arange(v0, v1) / width)
+    rows = empty((width, v1 - v0), iterdtype(int(mrows.max())))
+    shallow = int((r >= deepwidth).sum()) # radius only shrinks down the strip so the float64 rows come first
+    if shallow:
+        with kernellock:
+            expstrip64(rows[:, :shallow], float(cx), float(cy), r0, width, v0, v0 + shallow, mrows[:shallow])
+    if shallow < v1 - v0:
+        t = 2 * pi * arange(width) / width
+        dre = (cos(t)[:, None] * r[None, shallow:]).ravel()
+        dim = (sin(t)[:, None] * r[None, shallow:]).ravel()
+        rows[:, shallow:] = deeppoints(cx, cy, dre, dim, int(mrows[shallow:].max()), refprec(r[-1])).reshape(width, -1)
+    rows[rows >= mrows[None, :]] = 0
+    return rows
+
+def mandelexpzoom(cx, cy, keysw, iterkey, res):
+    '''yields the iterations of zoom frames resampled from one exponential map of the whole zoom, so the cost follows the depth instead of the frame count'''
+    from tqdm import tqdm
+    # where every pixel sits relative to the centre in units of the frame width, same mapping as mandelimgfast
+    px = (arange(res[0]) / float(res[0] - 1) - .5)[:, None]
+    py = ((arange(res[1]) / float(res[1] - 1) - .5) * res[1] / float(res[0]))[None, :]
+    rho = maximum(hypot(px, py), .25 / (res[0] - 1)) # the centre pixel can't sit at log 0
+    rhomax = rho.max()
+    width = int(2 * pi * rhomax * (res[0] - 1)) # samples around each circle, matches the pixel spacing at the edge of the frame
+    k = width / (2 * pi)                         # rows per e-fold of radius
+    r0 = keysw.max() * rhomax
+    ucol = (rint(arctan2(py, px) * k) % width).astype(int64) # the angle of a pixel is the same in every frame
+    dv = -k * log(rho)                                        # only the row offset changes, by a constant per frame
+
+    # a row's budget is the highest iterkey of any frame that reaches out to it, so every frame can cut it back down to its own
+    order = argsort(keysw)[::-1]
+    edges = -log(keysw[order] * rhomax)
+    budget = maximum.accumulate(array(iterkey)[order])
+    def rowbudget(v0, v1):
+        i = searchsorted(edges, -log(r0) + arange(v0, v1) / k, 'right') - 1
+        return budget[clip(i, 0, len(budget) - 1)]
+
+    dtype = iterdtype(int(budget[-1])) # the deepest budget, every strip of rows comes out no wider than it
+    strip = empty((width, 0), dtype)
+    vstart = 0
+    for i in tqdm(range(len(keysw))):
+        v = rint(k * log(r0 / keysw[i]) + dv).astype(int64)
+        vlo, vhi = int(v.min()), int(v.max()) + 1
+        if vlo < vstart: # zooming back out, the rows that were dropped are needed again
+            strip, vstart = empty((width, 0), dtype), vlo
+        strip, vstart = strip[:, max(0, vlo - vstart):], max(vstart, vlo) # rows no later frame needs
+        while vstart + strip.shape[1] < vhi: # adds a whole frame's worth of rows at a time so the window is copied rarely
+            v0 = vstart + strip.shape[1]
+            v1 = max(vhi, v0 + vhi - vlo)
+            strip = concatenate((strip, exprows(cx, cy, r0, width, v0, v1, rowbudget(v0, v1))), axis = 1)
+        iters = strip[ucol, v - vstart]
+        iters[iters >= iterkey[i]] = 0
+        yield iters
+
+def retile(full, small, changed, tile = 64):
+    '''redoes the LANCZOS downscale of full into small only on the tiles that the changed pixels of full fall in'''
+    from PIL import Image
+    if len(changed) == 0:
+        return
+    height, width = small.shape[:2]
+    across = (width + tile - 1) // tile
+    ys = changed // full.shape[1] // 2
+    xs = changed % full.shape[1] // 2
+    # a changed pixel also shows up in the downscaled pixels around it, which can be over in the next tile
+    tiles = [clip(ys + dy, 0, height - 1) // tile * across + clip(xs + dx, 0, width - 1) // tile
+             for dy in (-tilemargin, tilemargin) for dx in (-tilemargin, tilemargin)]
+    for t in unique(concatenate(tiles)):
+        y0, x0 = t // across * tile, t % across * tile
+        y1, x1 = min(y0 + tile, height), min(x0 + tile, width)
+        # a border wider than the filter reaches so the pixels kept come out exactly as in a full resize
+        cy0, cx0 = max(y0 - tilemargin, 0), max(x0 - tilemargin, 0)
+        cy1, cx1 = min(y1 + tilemargin, height), min(x1 + tilemargin, width)
+        img = Image.fromarray(full[cy0 * 2:cy1 * 2, cx0 * 2:cx1 * 2], "RGB")
+        small[y0:y1, x0:x1] = array(img.resize((cx1 - cx0, cy1 - cy0), Image.LANCZOS))[y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0]
+
+def mandeliter(cx, cy, w, maxiters, res, choice, noise, mode, keep = None):
+    '''returns a generator of the frames for the iteration animation, keep is the file name and metadata to save the iterations under'''
     h = (float(w) * float(res[1])) / float(res[0])
-    minx = cx - .5 * w
-    maxx = cx + .5 * w
-    miny = cy - .5 * h
-    maxy = cy + .5 * h
     # generates the values for iterations per pixel
-    iters = mandelimgfast(minx, maxx, miny, maxy, maxiters, res[0] * 2, res[1] * 2)
+    iters = mandelimgiters(cx, cy, w, h, maxiters, res[0] * 2, res[1] * 2)
+    if keep is not None: # every frame comes out of this one grid so it is all there is to keep
+        store = iterWriter(*keep)
+        store.add('iters', iters)
+        store.close()
+    return iterframes(iters, res, choice, noise, mode)
+
+def iterframes(iters, res, choice, noise, mode):
+    '''generates the frames for the iteration animation of a double resolution grid one at a time, each frame only redraws the pixels whose color changed'''
+    from PIL import Image
+    from tqdm import tqdm
     maximum = int(percentile(iters[iters != 0], 99.9)) + 1
     minimum = iters[iters != 0].min()
+    # sorting the pixels by iteration once so each frame can look up the ones at its iteration
+    flat = iters.T.ravel() # same order as the pixels of the image
+    order = argsort(flat, kind = 'mergesort')
+    bounds = searchsorted(flat[order], arange(maximum + 1))
+    bucket = lambda c: order[bounds[c]:bounds[c + 1]]
+    full = zeros((res[1] * 2, res[0] * 2, 3), uint8) # the frame before downscaling, kept between frames
+    pixels = full.reshape(-1, 3)
+    small = array(Image.fromarray(full, "RGB").resize((res[0], res[1]), Image.LANCZOS))
     # making the list of colors for faster access while making image
     if mode == "Add":
         colors = cols(choice, int(maximum + 1), noise, minimum)
         for number in tqdm(range(maximum - minimum)):
             c = minimum + number
-            image = itertoimage(clip(iters, 0, c) % c, colors)
-            img = Image.fromarray(image, "RGB")
-            img.resize((res[0], res[1]), Image.LANCZOS).save(str('./itercache/' + str(number) + '.png'))
+            # going up to c only uncovers the pixels that escaped at c - 1, the rest stay as they were
+            changed = bucket(c - 1) if c > 1 else order[:0]
+            pixels[changed] = colors[c - 1]
+            retile(full, small, changed)
+            yield small.copy() # the writer may still hold earlier frames so each one gets its own copy
     elif mode == "Single":
+        # the highlight is the color the palette already has at c, or white in grayscale, so the table is built once
+        colors = cols(choice, int(iters.max() + 1), noise, minimum) if choice else None
         for number in tqdm(range(maximum - minimum)):
             c = minimum + number
-            colors = cols(choice, int(iters.max() + 1), noise, minimum, c)
-            image = itertoimage(iters, colors)
-            img = Image.fromarray(image, "RGB")
-            img.resize((res[0], res[1]), Image.LANCZOS).save(str('./itercache/' + str(number) + '.png'))
-
-    return maximum - minimum
+            # only the pixels of the last highlighted iteration and the new one change
+            old = bucket(c - 1) if number else order[:0]
+            pixels[old] = 0
+            pixels[bucket(c)] = colors[c] if choice else (255, 255, 255)
+            retile(full, small, concatenate((old, bucket(c))))
+            yield small.copy()
 
 def mandelanimrender(cx, cy, endw, iters, choice, noise):
     '''has user choose between animation types for the mandelbrot set'''
+    from pick import pick
     print(u'\u001b[0m\u001b[1000D\u001b[1000A')
     title = "Pick a type of animation:"
     options = ["Zoom", "Iterations", "Cancel"]
@@ -227,33 +420,43 @@ def mandelanimrender(cx, cy, endw, iters, choice, noise):
     system('reset')
 
     if animtype == "Zoom":
-        frames = int(raw_input("Number of frames for final animation to have: "))
-        iterkey = linspace(200, iters, num = frames, dtype=uint16)
-        keysw = logspace(log10(4), log10(endw), frames, endpoint = True, base = 10.0)
-        for i in tqdm(range(frames)):
-            mandelzoom(cx, cy, keysw[i], iterkey[i], resolution, i, choice, noise)
-        animname = str('./anim/' + str((ndec(cx), ndec(cy))) + ' ' + str(ndec(endw)) + ' ' + str(resolution) + '.mp4')
-        with get_writer(animname, mode='I', fps = 60) as writer:
-            for i in range(frames):
-                image = imread('./zoomcache/' + str(i) + '.png')
-                writer.append_data(image)
-        for i in range(frames):
-            remove('./zoomcache/' + str(i) + '.png')
+        frames = int(ask("Number of frames for final animation to have: "))
+        mandelzoomanim(cx, cy, endw, iters, resolution, frames, choice, noise)
     elif animtype == "Iterations":
         mode = pick(["Add", "Single"], "Choose Iteration Mode:")[0]
-        frames = mandeliter(cx, cy, endw, iters, resolution, choice, noise, mode)
-        animname = str('./anim/' + str((ndec(cx), ndec(cy))) + ' ' + str(iters) + ' ' + str(resolution) + '.mp4')
-        with get_writer(animname, mode='I', fps = 30) as writer:
-            for i in range(frames):
-                image = imread('./itercache/' + str(i) + '.png')
-                writer.append_data(image)
-        for i in range(frames):
-            remove('./itercache/' + str(i) + '.png')
+        mandeliteranim(cx, cy, endw, iters, resolution, mode, choice, noise)
         
     tty.setraw(sys.stdin)
 
+def mandelzoomanim(cx, cy, endw, iters, resolution, frames, choice, noise):
+    '''renders a zoom from the whole set down to endw and returns the file name, with autoiters the budget of every frame
+    comes from its own view instead of ramping up to iters'''
+    keysw = logspace(log10(4), log10(endw), frames, endpoint = True, base = 10.0)
+    if autoiters:
+        iterkey = keybudgets(lambda w: mandelbudget(cx, cy, w, (w * resolution[1]) / resolution[0]), keysw)
+    else:
+        iterkey = linspace(200, iters, num = frames, dtype=int64)
+    animname = str('./anim/' + str((ndec(cx), ndec(cy))) + ' ' + str(ndec(endw)) + ' ' + str(resolution) + '.mp4')
+    if expzoom and farm.farmaddress is None: # the exponential map is one long strip, frames are what splits up across machines
+        zoom = mandelexpzoom(cx, cy, keysw, iterkey, resolution)
+    else:
+        zoom = poolframes(mandelzoom, [(cx, cy, keysw[i], iterkey[i], resolution) for i in range(frames)])
+    keep = (storename(animname), {'kind': 'frames', 'set': 'mandelbrot', 'x': str(cx), 'y': str(cy), 'w': repr(endw), 'iters': int(iterkey[-1]),
+                                  'res': list(resolution), 'fps': 60}) if keepiters else None
+    writeframes(colorframes(zoom, choice, noise, keep), animname, 60, './zoomcache/' if keepframes else None) # frames go straight to the video
+    return animname
+
+def mandeliteranim(cx, cy, w, iters, resolution, mode, choice, noise):
+    '''renders the iteration animation for a view and returns the file name'''
+    animname = str('./anim/' + str((ndec(cx), ndec(cy))) + ' ' + str(iters) + ' ' + str(resolution) + '.mp4')
+    keep = (storename(animname), {'kind': 'iterations', 'set': 'mandelbrot', 'x': str(cx), 'y': str(cy), 'w': repr(w), 'iters': iters,
+                                  'res': list(resolution), 'mode': mode, 'fps': 30}) if keepiters else None
+    writeframes(mandeliter(cx, cy, w, iters, resolution, choice, noise, mode, keep), animname, 30, './itercache/' if keepframes else None)
+    return animname
+
 def juliaimg(cx, cy, mx, my, w, iters, colchoice, noise):
     '''used to call mandelimggen with all variables, also provides selection to choose resolution'''
+    from pick import pick
     print(u'\u001b[0m' + u'\u001b[1000D' + u'\u001b[1000A')
     title = "Pick a resolution for the rendered image:"
     options = [(1920, 1080), (2560, 1440), (3840, 2160),
@@ -262,9 +465,9 @@ def juliaimg(cx, cy, mx, my, w, iters, colchoice, noise):
     if choice == 'Custom':
         try:
             system('reset')
-            width = int(raw_input("Width: "))
-            height = int(raw_input("Height: "))
-            aa = int(raw_input("AA Samples: "))
+            width = int(ask("Width: "))
+            height = int(ask("Height: "))
+            aa = int(ask("AA Samples: "))
             juliaimggen(cx, cy, mx, my, w, iters, (width, height), colchoice, noise, aa)
         except ValueError:
             print("Input numbers only", end = '')
@@ -274,79 +477,150 @@ def juliaimg(cx, cy, mx, my, w, iters, colchoice, noise):
     else:
         try:
             system('reset')
-            aa = int(raw_input("AA Samples: "))
+            aa = int(ask("AA Samples: "))
             juliaimggen(cx, cy, mx, my, w, iters, choice, colchoice, noise, aa)
         except ValueError:
             print("Input numbers only", end = '')
             sleep(1)
     tty.setraw(sys.stdin)
 
-def juliaimggen(cx, cy, mx, my, w, maxiters, res, number, noise, aa):
-    '''used to make the images when the user requests it can't be jit compiled because of PIL'''
-    h = (float(w) * float(res[1])) / float(res[0])
-    minx = cx - .5 * w
-    maxx = cx + .5 * w
-    miny = cy - .5 * h
-    maxy = cy + .5 * h
-    # generates the values for iterations per pixel
-    iters = juliaimgfast(minx, maxx, miny, maxy, mx, my, maxiters * 2, res[0] * aa, res[1] * aa)
-    iters %= maxiters * 2
-    maximum = iters.max()
-    # making the list of colors for faster access while making image
-    colors = cols(number, maximum + 1, noise, iters[iters != 0].min())
-
-    image = itertoimage(iters, colors)
-
-    img = Image.fromarray(image, "RGB")
-
-    img.resize((res[0], res[1]), Image.LANCZOS).save(str('./images/' + str((ndec(cx), ndec(cy))) +str((ndec(mx), ndec(my))) + ' ' + str(ndec(w)) + ' ' + str(res) + '.png'))
-    img.resize((res[0], res[1]), Image.LANCZOS).show()
+def juliaimggen(cx, cy, mx, my, w, maxiters, res, number, noise, aa, show = True):
+    '''used to make the images when the user requests it, renders in tiles so only a tile of it is ever in memory, returns the file name'''
+    from PIL import Image
+    view = ('julia', cx, cy, mx, my, w, maxiters, tuple(res), aa, smoothiters, refprec(w))
+    tile, points = imagefuncs(view)
+    name = str('./images/' + str((ndec(cx), ndec(cy))) +str((ndec(mx), ndec(my))) + ' ' + str(ndec(w)) + ' ' + str(res) + '.png')
+    keep = (storename(name), {'set': 'julia', 'x': str(cx), 'y': str(cy), 'mx': repr(mx), 'my': repr(my), 'w': repr(w), 'iters': maxiters}) if keepiters else None
+    posterimg(tile, res, aa, number, noise, name, [str(cx), str(cy), repr(mx), repr(my), repr(w), maxiters, aa], points, keep, farmcalls(view),
+              imagedtype(maxiters, smoothiters))
+    if show:
+        Image.open(name).show()
+    return name
+
+def juliaimgfast(xspace, yspace, mx, my, maxiter, eps):
+    '''just provides the pixel values which get cleaned by antialiasing later'''
+    from tqdm import tqdm
+    with tqdm(total = xspace.shape[0]) as bar:
+        return escapespace(xspace, yspace, True, mx, my, maxiter, eps, progress = bar.update)
+
+def warmkernels():
+    '''compiles the kernels the image and animation paths use on tiny inputs of the same types, with the disk cache this is mostly loading them,
+    every launch goes through kernellock so this can run on a thread beside the one drawing frames'''
+    tiny = linspace(-1.0, 1.0, 4)
+    escapegrid(-1.0, 1.0, -1.0, 1.0, False, 0.0, 0.0, 16, 4, 4, 1e-6)
+    escapepoints(tiny, tiny, False, 0.0, 0.0, 16, 1e-6)
+    escapegriddd(0.0, 0.0, 1e-15, 1e-15, True, -.8, .156, 16, 4, 4, 1e-18)
+    ddpoints(0.0, 0.0, tiny * 1e-15, tiny * 1e-15, True, -.8, .156, 16, 1e-18)
+    imgtrace(tiny, tiny, False, 0.0, 0.0, 16, tracetile)
+    with kernellock:
+        expstrip64(empty((8, 2), uint16), -.5, 0.0, 2.0, 8, 0, 2, array([16, 16], int64))
+    smoothgrid(-1.0, 1.0, -1.0, 1.0, False, 0.0, 0.0, 16, 4, 4, 1e-6)
+    smoothpoints(tiny, tiny, False, 0.0, 0.0, 16, 1e-6)
+    mandeldeep(Decimal('-1.75'), Decimal(0), 1e-15, 1e-15, 16, 4, 4)
+    deeppoints(Decimal('-1.75'), Decimal(0), tiny * 1e-15, tiny * 1e-15, 16, refprec(1e-15))
+
+def juliaimgiters(minx, maxx, miny, maxy, mx, my, maxiter, width, height, smooth = False):
+    '''picks between subdivision and juliaimgfast, smooth as in mandelimgiters'''
+    return juliaimgspace(linspace(minx, maxx, width), linspace(miny, maxy, height), mx, my, maxiter, (maxx - minx) / width * cycletol, smooth)
+
+def juliaimgspace(xspace, yspace, mx, my, maxiter, eps, smooth = False):
+    '''juliaimgiters over the points of xspace by yspace with cycle tolerance eps'''
+    if smooth:
+        return smoothspace(xspace, yspace, True, mx, my, maxiter, eps)
+    if not subdivide:
+        return juliaimgfast(xspace, yspace, mx, my, maxiter, eps)
+    iters = imgtrace(xspace, yspace, True, mx, my, maxiter, tracetile, eps)
+    if checksubdivide:
+        tracecompare(iters, juliaimgfast(xspace, yspace, mx, my, maxiter, eps))
+    return iters
 
-@jit(parallel=True, nogil=True)
-def juliaimgfast(minx, maxx, miny, maxy, mx, my, maxiter, width, height):
-    '''different than the other mandelfast as this one just provides the pixel values which get cleaned by antialiasing later'''
-    iters = empty((width, height), uint16) # makes empty array to populate with iterations
-    xspace = linspace(minx, maxx, width, dtype=float64)     # creates real values for quick access
-    yspace = linspace(miny, maxy, height, dtype=float64)    # creates imaginary values for quick access
-    for x in tqdm(range(width)):
-        for y in range(height):
-            iters[x, y] = juliafact(xspace[x], yspace[y], mx, my, maxiter)
+@jit(nopython=True, nogil=True, cache=True)
+def tracepoint(iters, x, y, xspace, yspace, julia, mx, my, maxiter, eps):
+    '''iterates a pixel for imgtrace unless it already has been'''
+    if iters[x, y] == 0:
+        if julia:
+            iters[x, y] = juliafact(xspace[x], yspace[y], mx, my, maxiter, eps)
+        else:
+            iters[x, y] = mandelfact(xspace[x], yspace[y], maxiter, eps)
+    return iters[x, y]
+
+def imgtrace(xspace, yspace, julia, mx, my, maxiter, tile, eps = None):
+    '''mariani-silver rendering, rectangles whose whole border has one iteration count get filled without iterating the inside,
+    eps is the cycle tolerance, by default out of the spacing of xspace'''
+    if eps is None:
+        eps = (xspace[-1] - xspace[0]) / xspace.shape[0] * cycletol
+    iters = zeros((xspace.shape[0], yspace.shape[0]), iterdtype(maxiter)) # 0 marks pixels that haven't been iterated yet
+    with kernellock:
+        tracegrid(iters, xspace, yspace, julia, mx, my, maxiter, tile, eps)
     return iters
 
-ndec = lambda x, n = 3: 0 if x == 0 else round(x, -int(floor(log10(abs(x)))) + (n - 1)) # used to make the names of files cleaner and to make readout shorter in command line
-@jit
-def itertoimage(iters, colors):
-    '''makes array of colors from iterations to make the image with fromarray'''
-    res = iters.shape
-    image = empty((res[1], res[0], 3), uint8)
-    # iters = clip(iters, 0, clipping) % clipping
-    for x in tqdm(range(res[0])):
-        for y in range(res[1]):
-            image[y, x] = colors[int(iters[x, y])]
-    return image
-
-def juliaanimimage(mx, my, res, number, choice, noise):
-    '''makes frames for panning across the julia set'''
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def tracegrid(iters, xspace, yspace, julia, mx, my, maxiter, tile, eps):
+    '''fills the zeroed iters for imgtrace'''
+    width = xspace.shape[0]
+    height = yspace.shape[0]
+    tilesx = (width + tile - 1) // tile
+    tilesy = (height + tile - 1) // tile
+    for t in prange(tilesx * tilesy):
+        stack = empty((64, 4), int64) # rectangles still to do as inclusive x0, y0, x1, y1, halving keeps this shallow
+        stack[0, 0] = (t % tilesx) * tile
+        stack[0, 1] = (t // tilesx) * tile
+        stack[0, 2] = min(stack[0, 0] + tile, width) - 1
+        stack[0, 3] = min(stack[0, 1] + tile, height) - 1
+        top = 1
+        while top > 0:
+            top -= 1
+            x0, y0, x1, y1 = stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3]
+            # iterating the whole border and checking if it is all one value
+            first = tracepoint(iters, x0, y0, xspace, yspace, julia, mx, my, maxiter, eps)
+            same = True
+            for x in range(x0, x1 + 1):
+                if tracepoint(iters, x, y0, xspace, yspace, julia, mx, my, maxiter, eps) != first: same = False
+                if tracepoint(iters, x, y1, xspace, yspace, julia, mx, my, maxiter, eps) != first: same = False
+            for y in range(y0 + 1, y1):
+                if tracepoint(iters, x0, y, xspace, yspace, julia, mx, my, maxiter, eps) != first: same = False
+                if tracepoint(iters, x1, y, xspace, yspace, julia, mx, my, maxiter, eps) != first: same = False
+            if same:
+                for x in range(x0 + 1, x1):
+                    for y in range(y0 + 1, y1):
+                        iters[x, y] = first
+            elif x1 - x0 < 4 or y1 - y0 < 4: # too small to be worth splitting again
+                for x in range(x0 + 1, x1):
+                    for y in range(y0 + 1, y1):
+                        tracepoint(iters, x, y, xspace, yspace, julia, mx, my, maxiter, eps)
+            elif x1 - x0 >= y1 - y0: # halving along the longer side, the halves share the middle line as border
+                m = (x0 + x1) // 2
+                stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3] = x0, y0, m, y1
+                stack[top + 1, 0], stack[top + 1, 1], stack[top + 1, 2], stack[top + 1, 3] = m, y0, x1, y1
+                top += 2
+            else:
+                m = (y0 + y1) // 2
+                stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3] = x0, y0, x1, m
+                stack[top + 1, 0], stack[top + 1, 1], stack[top + 1, 2], stack[top + 1, 3] = x0, m, x1, y1
+                top += 2
+
+def tracecompare(iters, brute):
+    '''prints how many pixels the subdivision got different from the brute force kernels'''
+    wrong = (iters != brute).sum()
+    print("Subdivision differs from brute force on " + str(wrong) + " of " + str(iters.size) + " pixels")
+
+ndec = lambda x, n = 3: 0 if x == 0 else round(float(x), -int(floor(log10(abs(x)))) + (n - 1)) # used to make the names of files cleaner and to make readout shorter in command line
+
+def juliaanimimage(mx, my, res):
+    '''makes the iterations of frames for panning across the julia set'''
     h = (float(4) * float(res[1])) / float(res[0])
     minx = -2.0
     maxx = 2.0
     miny = -.5 * h
     maxy = .5 * h
     # generates the values for iterations per pixel
-    iters = juliaimgfast(minx, maxx, miny, maxy, mx, my, 5000, res[0], res[1])
+    iters = juliaimgiters(minx, maxx, miny, maxy, mx, my, 5000, res[0], res[1])
     iters %= 5000
-    maximum = iters.max()
-    # making the list of colors for faster access while making image
-    colors = cols(choice, maximum + 1, noise, iters[iters != 0].min())
-
-    image = itertoimage(iters, colors)
-
-    img = Image.fromarray(image, "RGB")
-    
-    img.save(str('./janimcache/' + str(number) + '.png'))
+    return iters
 
 def juliapan(waypoints, choice, noise):
     '''gives user choices for resolution for julia pan animation'''
+    from pick import pick
     print(u'\u001b[0m\u001b[1000D\u001b[1000A')
     title = "Pick a resolution for the rendered animation:"
     options = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160), 'Cancel']
@@ -356,36 +630,19 @@ def juliapan(waypoints, choice, noise):
         tty.setraw(sys.stdin)
         return
     system('reset')
-    frames = int(raw_input("Number of frames for final animation to have: "))
-    mx = linspace(waypoints[0][0], waypoints[1][0], num=frames) # makes keyframes for animation to use
-    my = linspace(waypoints[0][1], waypoints[1][1], num=frames) # makes keyframes for animation to use
-    for i in tqdm(range(frames)):
-        juliaanimimage(mx[i], my[i], resolution, i, choice, noise)
-    animname = str('./anim/' + str((ndec(waypoints[0][0]), ndec(waypoints[0][1]))) + ' ' + str((ndec(waypoints[1][0]), ndec(waypoints[1][1]))) + ' ' + str(resolution) + '.mp4')
-    with get_writer(animname, mode='I', fps = 60) as writer:
-        for i in range(frames):
-            image = imread('./janimcache/' + str(i) + '.png')
-            writer.append_data(image)
-    for i in range(frames):
-        remove('./janimcache/' + str(i) + '.png')
+    frames = int(ask("Number of frames for final animation to have: "))
+    juliapananim(waypoints, resolution, frames, choice, noise)
     tty.setraw(sys.stdin)
     waypoints = []
 
-def bookmarks(x, y, w, iters):
-    '''Lets user choose from an existing bookmark or make a new one'''
-    bookmarks = loads(open("Bookmarks.json").read())
-    marks = list(bookmarks)
-    marks.append("+ New")
-    marks.append("Cancel")
-    location = pick(marks, "Choose a bookmark or make a new one")
-    if location[0] == "+ New":
-        system("reset")
-        Namechoice = str(raw_input("Choose a name for the bookmark: "))
-        bookmarks[Namechoice] = [x, y, w, iters]
-        open("Bookmarks.json", "w").write(str(dumps(bookmarks, sort_keys = True, indent = 4)).replace("\'", '\"').replace("u", ""))
-        return x, y, w, iters
-    elif location[0] == "Cancel":
-        return x, y, w, iters
-    else:
-        return bookmarks[location[0]]
-
+def juliapananim(waypoints, resolution, frames, choice, noise):
+    '''renders the julia sets along the line between two points and returns the file name'''
+    mx = linspace(waypoints[0][0], waypoints[1][0], num=frames) # makes keyframes for animation to use
+    my = linspace(waypoints[0][1], waypoints[1][1], num=frames) # makes keyframes for animation to use
+    animname = str('./anim/' + str((ndec(waypoints[0][0]), ndec(waypoints[0][1]))) + ' ' + str((ndec(waypoints[1][0]), ndec(waypoints[1][1]))) + ' ' + str(resolution) + '.mp4')
+    jobs = [(mx[i], my[i], resolution) for i in range(frames)]
+    keep = (storename(animname), {'kind': 'frames', 'set': 'julia', 'waypoints': [list(map(float, p)) for p in waypoints[:2]], 'iters': 5000,
+                                  'res': list(resolution), 'fps': 60}) if keepiters else None
+    # the workers send back iterations, two bytes a pixel instead of three, and the coloring happens here
+    writeframes(colorframes(poolframes(juliaanimimage, jobs), choice, noise, keep), animname, 60, './janimcache/' if keepframes else None)
+    return animname
@@ -0,0 +1,58 @@
+from json import dumps
+from time import time
+from timeit import default_timer
+
+
+class frameHud:
+    '''times the stages of each frame for the status line, and can write every frame to a trace file as a line of json'''
+    def __init__(self, show = False, trace = None, launched = None):
+        self.show = show
+        self.trace = open(trace, 'a') if trace else None
+        self.frames = 0
+        self.launched = launched  # default_timer() when the program started
+        self.firstframe = None    # seconds from launching to the end of the first frame
+        self.times = []     # (stage, seconds) for the frame so far, in order
+        self.stats = {}     # what the last frame computed and wrote
+        self.last = default_timer()
+
+    def start(self):
+        self.times = []
+        self.last = default_timer()
+
+    def lap(self, stage):
+        '''ends the stage that has been running since the last lap'''
+        now = default_timer()
+        self.times.append((stage, now - self.last))
+        self.last = now
+
+    def finish(self, grid, maxiter, computed, sent, fullbytes, params):
+        '''works out the frame's numbers from its raw sample grid and writes the trace line, params are the view it was drawn at'''
+        compute = sum(t for stage, t in self.times if stage == 'iters')
+        interior = float((grid >= maxiter).sum()) / grid.size
+        # only the samples the cache had to compute cost anything, assumes they look like the rest of the grid
+        iterations = float(grid.sum()) * computed / grid.size
+        self.stats = {'interior': interior, 'escaped': 1 - interior, 'computed': computed,
+                      'iters_per_s': iterations / compute if compute > 0 else 0.0, 'bytes': sent, 'fullbytes': fullbytes}
+        if self.frames == 0 and self.launched is not None:
+            self.firstframe = default_timer() - self.launched
+            self.stats['first_frame'] = self.firstframe
+        if self.trace is not None:
+            line = {'frame': self.frames, 'time': time(), 'stages': dict(self.times)}
+            line.update(self.stats)
+            line.update(params)
+            self.trace.write(dumps(line, sort_keys = True) + '\n')
+            self.trace.flush()
+        self.frames += 1
+
+    def line(self):
+        '''the text that goes after the coordinates, empty while the hud is off'''
+        if not self.show:
+            return ''
+        text = ''.join(' ' * 3 + stage + ' ' + str(round(t * 1000, 1)) + 'ms' for stage, t in self.times)
+        return text + ' ' * 3 + str(round(self.stats.get('iters_per_s', 0) / 1e6, 1)) + 'Mit/s' + ' ' * 3 + \
+            'Esc ' + str(int(round(self.stats.get('escaped', 0) * 100))) + '% In ' + str(int(round(self.stats.get('interior', 0) * 100))) + '%' + \
+            (' ' * 3 + 'First frame ' + str(round(self.firstframe, 2)) + 's' if self.firstframe is not None else '')
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
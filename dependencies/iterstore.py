@@ -0,0 +1,82 @@
+from io import BytesIO
+from json import dumps, loads
+from os import path, rename
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from numpy import finfo, float16, float64, floor, iinfo, uint8, uint16, uint32
+from numpy.lib.format import read_array, write_array
+
+from kernels import kernelversion
+
+storeversion = 2    # layout of the store itself, goes up if the members or metadata change meaning
+storetol = 1 / 8.0  # how far off in counts a continuous count can come back, past that a member keeps its float32
+
+
+def storename(name):
+    '''where the iterations behind an image or animation get kept, next to it with the extension swapped'''
+    return path.splitext(name)[0] + '.npz'
+
+def compact(iters):
+    '''iters as a store keeps them and the offset taken off, whole counts go into the narrowest unsigned int that holds
+    them less their smallest one and continuous counts into float16 wherever that stays within storetol'''
+    if not iters.size:
+        return iters, 0
+    offset = int(floor(iters.min()))
+    if iters.dtype.kind == 'f':
+        if iters.max() - offset > finfo(float16).max:
+            return iters, 0
+        small = (iters - offset).astype(float16)
+        if abs(small.astype(float64) + offset - iters).max() <= storetol:
+            return small, offset
+        return iters, 0
+    spread = int(iters.max()) - offset
+    for kind in (uint8, uint16, uint32):
+        if spread <= iinfo(kind).max:
+            return (iters - offset).astype(kind), offset
+    return iters, 0
+
+class iterWriter:
+    '''writes iteration arrays as separately compressed .npy members of a zip, the layout numpy's npz files use,
+    so a store can be read back one chunk at a time, meta is anything json can hold describing the render'''
+    def __init__(self, name, meta):
+        self.name = name
+        self.meta = dict(meta)
+        self.meta['kernel'] = kernelversion
+        self.meta['format'] = storeversion
+        self.members = {}   # key to the dtype and offset get gives a member back with
+        self.zip = ZipFile(name + '.part', 'w', ZIP_DEFLATED, allowZip64 = True)
+
+    def add(self, key, iters):
+        '''stores a member compacted, a deep render or an animation's frames rarely need the width of the dtype they come in'''
+        stored, offset = compact(iters)
+        buf = BytesIO()
+        write_array(buf, stored)
+        self.zip.writestr(key + '.npy', buf.getvalue())
+        self.members[key] = {'dtype': iters.dtype.name, 'offset': offset}
+
+    def close(self, **meta):
+        '''writes the metadata, with anything only known at the end added to it, and moves the store into place'''
+        self.meta.update(meta)
+        self.zip.writestr('members.json', dumps(self.members, sort_keys = True)) # kept apart so meta only describes the render
+        self.zip.writestr('meta.json', dumps(self.meta, sort_keys = True))
+        self.zip.close()
+        rename(self.name + '.part', self.name)
+
+class iterReader:
+    '''reads a store written by iterWriter, stores from before members were compacted read as they are'''
+    def __init__(self, name):
+        self.zip = ZipFile(name)
+        self.meta = loads(self.zip.read('meta.json').decode('utf-8'))
+        names = self.zip.namelist()
+        self.members = loads(self.zip.read('members.json').decode('utf-8')) if 'members.json' in names else {}
+
+    def get(self, key):
+        iters = read_array(BytesIO(self.zip.read(key + '.npy')))
+        if key not in self.members:
+            return iters
+        iters = iters.astype(self.members[key]['dtype'])
+        iters += iters.dtype.type(self.members[key]['offset']) # a scalar of its own type so the sum stays in it
+        return iters
+
+    def keys(self):
+        return sorted(member[:-4] for member in self.zip.namelist() if member.endswith('.npy'))
@@ -0,0 +1,314 @@
+from decimal import Decimal
+from math import log
+from threading import RLock
+
+from numba import jit, prange
+from numpy import empty, float32, linspace, uint16, uint32
+
+try:
+    from numba import get_num_threads
+except ImportError: # numba before 0.49, which includes the last ones for python 2, always runs the thread count it started with
+    from numba import config
+    get_num_threads = lambda: config.NUMBA_NUM_THREADS
+
+chunkcols = 16  # columns each thread gets per call when progress is reported, the callback runs between calls
+kernelversion = 2  # goes up whenever a change here can move iteration counts, kept iterations are tagged with it
+ddwidth = 1e-28    # below this width neighbouring double-double pixels start to land on the same coordinate, the same margin as deepwidth
+kernellock = RLock()  # held around every launch of a parallel kernel, numba's workqueue layer aborts when two threads launch at once
+
+
+def iterdtype(maxiter):
+    '''the narrowest unsigned int that holds counts up to maxiter with one to spare, so adding one to a count can't wrap'''
+    return uint16 if maxiter < 65535 else uint32
+
+@jit(nopython=True, nogil=True, cache=True)
+def juliafact(x, y, mx, my, iterations, eps):
+    '''does julia factorization for a given point up to a certain number of iterations'''
+    # standard julia set function with brent cycle detection, the orbit is compared to a saved point that moves on every power of two steps
+    n = 1
+    ox = x
+    oy = y
+    power = 1
+    lam = 0
+    while n < iterations and x * x + y * y < 4.0:
+        aa = x * x - y * y
+        bb = 2 * x * y
+        x = aa + mx
+        y = bb + my
+        n += 1
+        if abs(x - ox) < eps and abs(y - oy) < eps:
+            return iterations # came back to the saved point so it is never going to escape
+        lam += 1
+        if lam == power:
+            ox = x
+            oy = y
+            power *= 2
+            lam = 0
+    return n
+
+@jit(nopython=True, nogil=True, cache=True)
+def mandelfact(x, y, iterations, eps):
+    '''does mandelbrot factorization for a given point up to a certain number of iterations'''
+    # optimization to avoid calculations for the main and secondary bulbs
+    q = ((x - .25) ** 2) + (y ** 2)
+    if q * (q + x - .25) < .25 * y ** 2:
+        return iterations
+    if (x + 1) ** 2 + y ** 2 <= 1/16.0:
+        return iterations
+    # basic mandelbrot function with the exponent check in the while loop to avoid an extra if and the same cycle detection as juliafact
+    ca = x
+    cb = y
+    n = 1
+    ox = x
+    oy = y
+    power = 1
+    lam = 0
+    while n < iterations and x * x + y * y < 4.0:
+        aa = x * x - y * y
+        bb = 2 * x * y
+        x = aa + ca
+        y = bb + cb
+        n += 1
+        if abs(x - ox) < eps and abs(y - oy) < eps:
+            return iterations
+        lam += 1
+        if lam == power:
+            ox = x
+            oy = y
+            power *= 2
+            lam = 0
+    return n
+
+@jit(nopython=True, nogil=True, cache=True)
+def escape(x, y, julia, mx, my, maxiter, eps):
+    '''iterations for one point of either set'''
+    if julia:
+        return juliafact(x, y, mx, my, maxiter, eps)
+    return mandelfact(x, y, maxiter, eps)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def escapecols(iters, xspace, yspace, julia, mx, my, maxiter, eps, x0, x1):
+    '''fills columns x0 to x1 of iters with one sample per point, the columns are spread over the cores'''
+    for x in prange(x0, x1):
+        for y in range(yspace.shape[0]):
+            iters[x, y] = escape(xspace[x], yspace[y], julia, mx, my, maxiter, eps)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def escapelist(iters, xs, ys, julia, mx, my, maxiter, eps):
+    '''fills iters with the iterations for a list of points that don't make up a grid'''
+    for i in prange(xs.shape[0]):
+        iters[i] = escape(xs[i], ys[i], julia, mx, my, maxiter, eps)
+
+@jit(nopython=True, nogil=True, cache=True)
+def smoothescape(x, y, julia, mx, my, maxiter, eps):
+    '''escape as a continuous count, the whole count less how far past the escape radius the orbit got, which takes the
+    bands out of the colors, points that never escape come out as maxiter the same as in escape'''
+    if not julia:
+        q = ((x - .25) ** 2) + (y ** 2)
+        if q * (q + x - .25) < .25 * y ** 2 or (x + 1) ** 2 + y ** 2 <= 1/16.0:
+            return float(maxiter)
+        mx = x
+        my = y
+    n = 1
+    ox = x
+    oy = y
+    power = 1
+    lam = 0
+    while n < maxiter and x * x + y * y < 4.0:
+        aa = x * x - y * y
+        bb = 2 * x * y
+        x = aa + mx
+        y = bb + my
+        n += 1
+        if abs(x - ox) < eps and abs(y - oy) < eps:
+            return float(maxiter)
+        lam += 1
+        if lam == power:
+            ox = x
+            oy = y
+            power *= 2
+            lam = 0
+    if n >= maxiter:
+        return float(maxiter)
+    # log2 of log2 |z| runs from 0 at the escape radius of 2 to about 1.4 once the orbit started inside it, so the value stays
+    # within a count of n, points that start outside it are held at 1 so nothing escaped comes out as 0, which is the set
+    return max(n + 1 - log(log(x * x + y * y) / (2 * log(2.0))) / log(2.0), 1.0)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def smoothcols(iters, xspace, yspace, julia, mx, my, maxiter, eps):
+    '''escapecols with continuous counts'''
+    for x in prange(xspace.shape[0]):
+        for y in range(yspace.shape[0]):
+            iters[x, y] = smoothescape(xspace[x], yspace[y], julia, mx, my, maxiter, eps)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def smoothlist(iters, xs, ys, julia, mx, my, maxiter, eps):
+    '''escapelist with continuous counts'''
+    for i in prange(xs.shape[0]):
+        iters[i] = smoothescape(xs[i], ys[i], julia, mx, my, maxiter, eps)
+
+@jit(nopython=True, nogil=True, cache=True)
+def twosum(a, b):
+    '''a + b as a rounded sum and the exact error of rounding it'''
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+@jit(nopython=True, nogil=True, cache=True)
+def twoprod(a, b):
+    '''a * b as a rounded product and its exact error, dekker splits each side into halves whose products fit in a double'''
+    p = a * b
+    t = 134217729.0 * a # 2 ** 27 + 1
+    ah = t - (t - a)
+    al = a - ah
+    t = 134217729.0 * b
+    bh = t - (t - b)
+    bl = b - bh
+    return p, ((ah * bh - p) + ah * bl + al * bh) + al * bl
+
+@jit(nopython=True, nogil=True, cache=True)
+def ddadd(ah, al, bh, bl):
+    '''sum of two double-doubles, each held as a high double and the low double left over from it'''
+    s, e = twosum(ah, bh)
+    e += al + bl
+    h = s + e
+    return h, e - (h - s)
+
+@jit(nopython=True, nogil=True, cache=True)
+def ddmul(ah, al, bh, bl):
+    '''product of two double-doubles'''
+    p, e = twoprod(ah, bh)
+    e += ah * bl + al * bh
+    h = p + e
+    return h, e - (h - p)
+
+@jit(nopython=True, nogil=True, cache=True)
+def ddfact(xh, xl, yh, yl, julia, mxh, mxl, myh, myl, iterations, eps):
+    '''the same iteration, cycle check and bulb check as juliafact and mandelfact in double-double, about 32 digits'''
+    if not julia:
+        q = ((xh - .25) ** 2) + (yh ** 2)
+        if q * (q + xh - .25) < .25 * yh ** 2:
+            return iterations
+        if (xh + 1) ** 2 + yh ** 2 <= 1/16.0:
+            return iterations
+        mxh, mxl, myh, myl = xh, xl, yh, yl
+    n = 1
+    oxh, oxl, oyh, oyl = xh, xl, yh, yl
+    power = 1
+    lam = 0
+    while n < iterations and xh * xh + yh * yh < 4.0:
+        x2h, x2l = ddmul(xh, xl, xh, xl)
+        y2h, y2l = ddmul(yh, yl, yh, yl)
+        xyh, xyl = ddmul(xh, xl, yh, yl)
+        ah, al = ddadd(x2h, x2l, -y2h, -y2l)
+        xh, xl = ddadd(ah, al, mxh, mxl)
+        yh, yl = ddadd(2 * xyh, 2 * xyl, myh, myl)
+        n += 1
+        if abs((xh - oxh) + (xl - oxl)) < eps and abs((yh - oyh) + (yl - oyl)) < eps:
+            return iterations
+        lam += 1
+        if lam == power:
+            oxh, oxl, oyh, oyl = xh, xl, yh, yl
+            power *= 2
+            lam = 0
+    return n
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def escapecolsdd(iters, cxh, cxl, cyh, cyl, dx, dy, julia, mxh, mxl, myh, myl, maxiter, eps, x0, x1):
+    '''escapecols for points given as offsets dx, dy from a double-double centre, the offsets only need float64'''
+    for x in prange(x0, x1):
+        ph, pl = ddadd(cxh, cxl, dx[x], 0.0)
+        for y in range(dy.shape[0]):
+            qh, ql = ddadd(cyh, cyl, dy[y], 0.0)
+            iters[x, y] = ddfact(ph, pl, qh, ql, julia, mxh, mxl, myh, myl, maxiter, eps)
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def escapelistdd(iters, cxh, cxl, cyh, cyl, dx, dy, julia, mxh, mxl, myh, myl, maxiter, eps):
+    '''escapelist for a list of offsets from a double-double centre'''
+    for i in prange(dx.shape[0]):
+        ph, pl = ddadd(cxh, cxl, dx[i], 0.0)
+        qh, ql = ddadd(cyh, cyl, dy[i], 0.0)
+        iters[i] = ddfact(ph, pl, qh, ql, julia, mxh, mxl, myh, myl, maxiter, eps)
+
+def escapegrid(minx, maxx, miny, maxy, julia, mx, my, maxiter, width, height, eps, progress = None):
+    '''iterations over a grid of width by height points
+
+    the kernel is called a chunk of columns at a time when progress is given, progress(columns) runs between chunks
+    so reporting stays out of the compiled code'''
+    return escapespace(linspace(minx, maxx, width), linspace(miny, maxy, height), julia, mx, my, maxiter, eps, progress)
+
+def escapespace(xspace, yspace, julia, mx, my, maxiter, eps, progress = None):
+    '''escapegrid over the points of xspace by yspace, a tile takes these out of the linspaces of the whole image'''
+    width = xspace.shape[0]
+    iters = empty((width, yspace.shape[0]), iterdtype(maxiter))
+    step = width if progress is None else chunkcols * get_num_threads()
+    for x0 in range(0, width, step):
+        x1 = min(x0 + step, width)
+        with kernellock: # let go between chunks so a render on another thread can get in
+            escapecols(iters, xspace, yspace, julia, mx, my, maxiter, eps, x0, x1)
+        if progress is not None:
+            progress(x1 - x0)
+    return iters
+
+def escapepoints(xs, ys, julia, mx, my, maxiter, eps):
+    '''iterations for a list of points that don't make up a grid'''
+    iters = empty(xs.shape[0], iterdtype(maxiter))
+    with kernellock:
+        escapelist(iters, xs, ys, julia, mx, my, maxiter, eps)
+    return iters
+
+def smoothgrid(minx, maxx, miny, maxy, julia, mx, my, maxiter, width, height, eps):
+    '''escapegrid with continuous counts as float32, which keeps a fraction of a count right up to a few million'''
+    return smoothspace(linspace(minx, maxx, width), linspace(miny, maxy, height), julia, mx, my, maxiter, eps)
+
+def smoothspace(xspace, yspace, julia, mx, my, maxiter, eps):
+    '''smoothgrid over the points of xspace by yspace, as in escapespace'''
+    iters = empty((xspace.shape[0], yspace.shape[0]), float32)
+    with kernellock:
+        smoothcols(iters, xspace, yspace, julia, mx, my, maxiter, eps)
+    return iters
+
+def smoothpoints(xs, ys, julia, mx, my, maxiter, eps):
+    '''escapepoints with continuous counts'''
+    iters = empty(xs.shape[0], float32)
+    with kernellock:
+        smoothlist(iters, xs, ys, julia, mx, my, maxiter, eps)
+    return iters
+
+def ddsplit(x):
+    '''a float or Decimal as the high and low doubles of a double-double'''
+    high = float(x)
+    return high, float(Decimal(x) - Decimal(high))
+
+def escapegriddd(cx, cy, w, h, julia, mx, my, maxiter, width, height, eps, progress = None):
+    '''escapegrid in double-double for a view w by h centred on cx, cy, which can be Decimal, progress as in escapegrid'''
+    # pixel offsets from the centre, these stay accurate at any depth
+    return escapespacedd(cx, cy, linspace(-.5 * w, .5 * w, width), linspace(-.5 * h, .5 * h, height), julia, mx, my, maxiter, eps, progress)
+
+def escapespacedd(cx, cy, dx, dy, julia, mx, my, maxiter, eps, progress = None):
+    '''escapegriddd over the offsets dx by dy from cx, cy, as in escapespace'''
+    width = dx.shape[0]
+    iters = empty((width, dy.shape[0]), iterdtype(maxiter))
+    centre = ddsplit(cx) + ddsplit(cy)
+    c = ddsplit(mx) + ddsplit(my)
+    step = width if progress is None else chunkcols * get_num_threads()
+    for x0 in range(0, width, step):
+        x1 = min(x0 + step, width)
+        with kernellock:
+            escapecolsdd(iters, centre[0], centre[1], centre[2], centre[3], dx, dy, julia, c[0], c[1], c[2], c[3], maxiter, eps, x0, x1)
+        if progress is not None:
+            progress(x1 - x0)
+    return iters
+
+def ddpoints(cx, cy, dx, dy, julia, mx, my, maxiter, eps):
+    '''escapepoints in double-double for offsets dx, dy from cx, cy'''
+    centre = ddsplit(cx) + ddsplit(cy)
+    c = ddsplit(mx) + ddsplit(my)
+    iters = empty(dx.shape[0], iterdtype(maxiter))
+    with kernellock:
+        escapelistdd(iters, centre[0], centre[1], centre[2], centre[3], dx, dy, julia, c[0], c[1], c[2], c[3], maxiter, eps)
+    return iters
+
+def launchthreads():
+    '''starts numba's thread pool from the calling thread, with tbb the process hangs on exit if a worker thread starts it first'''
+    escapegrid(0.0, 0.0, 0.0, 0.0, False, 0.0, 0.0, 1, 1, 1, 0.0)
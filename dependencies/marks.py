@@ -0,0 +1,175 @@
+from decimal import Decimal, getcontext
+from hashlib import md5
+from json import dumps, loads
+from os import mkdir, path, rename, stat
+from threading import Condition, Thread
+
+from background import Cancelled
+from iterstore import iterReader, iterWriter, storeversion
+from kernels import kernelversion
+from perturb import refprec
+from viewcache import viewCache
+
+markname = 'Bookmarks.json' # name to [x, y, w, iters], the batch renderer and the benchmarks read the same file
+markcache = './markcache/'  # iterations kept for every bookmark, one store each named after a hash of the bookmark's name
+thumbsize = (40, 10)        # cells the picker's preview of the highlighted bookmark takes up
+
+
+def markview(view, size):
+    '''the centre, width, height and sample grid the loops draw a bookmark at in a terminal of size (columns, rows)'''
+    x, y, w, iters = view
+    width, height = size
+    return Decimal(x), Decimal(y), w, (w * height * 2) / width, iters, width * 2, height * 2
+
+
+class markStore:
+    '''the bookmarks file kept in memory, read again only when something else has changed it and written through a rename
+    so a crash can't leave it half written'''
+    def __init__(self, name = markname):
+        self.name = name
+        self.marks = {}
+        self.stamp = None   # (mtime, size) of the file as last read or written
+
+    def load(self):
+        '''the bookmarks as a dict, from memory unless the file changed on disk'''
+        stamp = (stat(self.name).st_mtime, stat(self.name).st_size) if path.exists(self.name) else None
+        if stamp != self.stamp:
+            self.marks = loads(open(self.name).read()) if stamp is not None else {}
+            self.stamp = stamp
+        return self.marks
+
+    def names(self):
+        return sorted(self.load())
+
+    def get(self, name):
+        return self.load()[name]
+
+    def add(self, name, view):
+        '''adds or replaces one bookmark, view is [x, y, w, iters]'''
+        marks = dict(self.load())
+        marks[name] = list(view)
+        with open(self.name + '.tmp', 'w') as f:
+            f.write(dumps(marks, sort_keys = True, indent = 4))
+        rename(self.name + '.tmp', self.name)
+        self.marks = marks
+        self.stamp = (stat(self.name).st_mtime, stat(self.name).st_size)
+
+
+class markCache:
+    '''iterations for every bookmark at the size the mandelbrot loop draws it and at thumbnail size, made on a background thread
+
+    samples is called like the viewCache's samples, size is the terminal's (columns, rows) and gets set by the loop,
+    a store is made again whenever its bookmark, the terminal size or the kernel version no longer match it, idle()
+    returning False holds the thread back so it doesn't slow down the frames being drawn, it is asked again between
+    every chunk of columns so a frame started part way through a store only waits for the chunk in progress, or for the
+    whole grid of a bookmark past float64 as the perturbation engine doesn't call progress'''
+    def __init__(self, marks, samples, folder = markcache, idle = None):
+        self.marks = marks
+        self.samples = samples
+        self.folder = folder
+        self.idle = idle or (lambda: True)
+        self.lock = Condition()
+        self.size = None
+        self.grids = {}     # name to (meta, {'screen': grid, 'thumb': grid}) for every store that has been read or made
+        self.failed = {}    # name to the meta of a store that couldn't be made, not tried again until something changes
+        self.closed = False
+        if not path.isdir(folder):
+            mkdir(folder)
+        thread = Thread(target = self.run)
+        thread.daemon = True
+        thread.start()
+
+    def storename(self, name):
+        return path.join(self.folder, md5(name.encode('utf-8')).hexdigest() + '.npz')
+
+    def meta(self, view, size):
+        '''what a store has to have been made with to still be good, the kernel and store versions are added by iterWriter'''
+        return {'view': list(view), 'size': list(size), 'thumb': list(thumbsize), 'kernel': kernelversion, 'format': storeversion}
+
+    def resize(self, size):
+        '''called by the loop with the terminal's (columns, rows) on every frame, a new size starts the stores over'''
+        if size != self.size:
+            with self.lock:
+                self.size = size
+                self.lock.notify_all()
+
+    def get(self, name, kind):
+        '''the grid of kind 'screen' or 'thumb' for a bookmark if it has one matching the bookmark and the terminal, otherwise None'''
+        with self.lock:
+            size = self.size
+            kept = self.grids.get(name)
+        if size is None or kept is None or name not in self.marks.load() or kept[0] != self.meta(self.marks.get(name), size):
+            return None
+        return kept[1][kind]
+
+    def read(self, name, meta):
+        '''takes a store off disk if it is there and still good'''
+        try:
+            store = iterReader(self.storename(name))
+            if store.meta != meta:
+                return False
+            grids = {'screen': store.get('screen'), 'thumb': store.get('thumb')}
+        except (IOError, OSError, KeyError, ValueError):
+            return False # missing or unreadable, gets made again
+        with self.lock:
+            self.grids[name] = (meta, grids)
+        return True
+
+    def make(self, name, view, size):
+        '''renders the thumbnail and the screen grid through a viewCache, so the screen grid lines up with the one the loop would make'''
+        def progress(columns):
+            if self.closed or not self.idle(): raise Cancelled() # started over once nothing else is drawing
+        grids = {}
+        for kind, cells in (('thumb', thumbsize), ('screen', size)):
+            cx, cy, w, h, iters, width, height = markview(view, cells)
+            getcontext().prec = refprec(w) # every thread has its own context
+            grids[kind] = viewCache(self.samples).get(cx, cy, w, h, iters, width, height, progress)
+        meta = self.meta(view, size)
+        store = iterWriter(self.storename(name), {'view': list(view), 'size': list(size), 'thumb': list(thumbsize)})
+        for kind in grids:
+            store.add(kind, grids[kind])
+        store.close()
+        with self.lock:
+            self.grids[name] = (meta, grids)
+
+    def next(self, size):
+        '''the first bookmark without a good store, reading the ones already on disk on the way'''
+        marks = self.marks.load()
+        for name in sorted(marks):
+            meta = self.meta(marks[name], size)
+            with self.lock:
+                kept = self.grids.get(name)
+            if (kept is not None and kept[0] == meta) or self.failed.get(name) == meta or self.read(name, meta):
+                continue
+            return name, marks[name], meta
+        return None
+
+    def run(self):
+        while 1:
+            with self.lock:
+                while not self.closed and (self.size is None or not self.idle()):
+                    self.lock.wait(.25)
+                if self.closed:
+                    return
+                size = self.size
+            try:
+                job = self.next(size)
+            except (IOError, OSError, ValueError):
+                job = None # the bookmarks file is being replaced or is broken, looked at again in a moment
+            if job is None:
+                with self.lock:
+                    if not self.closed:
+                        self.lock.wait(1) # new bookmarks or a new size
+                continue
+            name, view, meta = job
+            try:
+                self.make(name, view, size)
+            except Cancelled:
+                pass
+            except Exception:
+                self.failed[name] = meta
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
@@ -0,0 +1,145 @@
+from decimal import Decimal, localcontext
+from math import log10, sqrt
+
+from numba import jit, prange
+from numpy import complex128, empty, int32, linspace, nonzero, zeros
+
+from kernels import iterdtype, kernellock
+
+deepwidth = 1e-13   # below this width neighbouring float64 pixels start to land on the same coordinate
+glitchtol = 1e-6    # pauldelbrot tolerance, |Z + dz|^2 below this fraction of |Z|^2 means dz lost its precision
+seriestol = 1e-12   # how small the cubic term has to stay next to the linear one before iterating properly
+maxrefs = 16        # how many new reference points to try before giving up on glitched pixels
+
+
+def refprec(w):
+    '''number of decimal digits needed to place the reference orbit at this width'''
+    return max(20, int(-log10(w)) + 20)
+
+def referenceorbit(cx, cy, prec, maxiter):
+    '''iterates the reference point with prec digits and returns the orbit rounded to float64'''
+    orbit = zeros(maxiter + 1, complex128)
+    with localcontext() as ctx:
+        ctx.prec = prec
+        ca = Decimal(cx)
+        cb = Decimal(cy)
+        x = Decimal(0)
+        y = Decimal(0)
+        n = 0
+        while n <= maxiter:
+            orbit[n] = complex(float(x), float(y))
+            if x * x + y * y > 4:
+                break
+            x, y = x * x - y * y + ca, 2 * x * y + cb
+            n += 1
+    return orbit, min(n + 1, maxiter + 1) # orbit and how many entries of it are valid
+
+@jit(nopython=True, nogil=True, cache=True)
+def seriesskip(orbit, reflen, r, maxiter):
+    '''finds how many iterations the cubic series approximation can skip for offsets up to r'''
+    a = 1.0 + 0j # coefficients of dz_n = a*d + b*d^2 + c*d^3 at n = 1
+    b = 0j
+    c = 0j
+    skip = 1
+    sa, sb, sc = a, b, c
+    n = 1
+    while n < maxiter - 1 and n < reflen - 1:
+        z = orbit[n]
+        na = 2 * z * a + 1
+        nb = 2 * z * b + a * a
+        nc = 2 * z * c + 2 * a * b
+        a, b, c = na, nb, nc
+        n += 1
+        # the cubic term has to stay negligible next to the linear one
+        if abs(c) * r * r > seriestol * abs(a):
+            break
+        # and no pixel in the view may have escaped during the skipped iterations
+        if abs(orbit[n]) + abs(a) * r + abs(b) * r * r + abs(c) * r * r * r >= 2.0:
+            break
+        skip = n
+        sa, sb, sc = a, b, c
+    return skip, sa, sb, sc
+
+@jit(nopython=True, nogil=True, cache=True)
+def deltafact(d, orbit, reflen, skip, sa, sb, sc, maxiter, tol):
+    '''iterates one pixel as an offset d from the reference orbit, returns -1 if the pixel glitched'''
+    dz = sa * d + sb * d * d + sc * d * d * d
+    n = skip
+    while n < maxiter:
+        if n >= reflen:
+            return -1 # reference escaped before this pixel did
+        zn = orbit[n]
+        z = zn + dz
+        zz = z.real * z.real + z.imag * z.imag
+        if zz >= 4.0:
+            return n
+        if zz < tol * (zn.real * zn.real + zn.imag * zn.imag):
+            return -1
+        dz = 2 * zn * dz + dz * dz + d
+        n += 1
+    return maxiter
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def deltagrid(dx, dy, orbit, reflen, skip, sa, sb, sc, maxiter, tol):
+    '''runs deltafact over a grid of offsets'''
+    iters = empty((dx.shape[0], dy.shape[0]), int32)
+    for x in prange(dx.shape[0]):
+        for y in range(dy.shape[0]):
+            iters[x, y] = deltafact(complex(dx[x], dy[y]), orbit, reflen, skip, sa, sb, sc, maxiter, tol)
+    return iters
+
+@jit(parallel=True, nopython=True, nogil=True, cache=True)
+def deltapoints(dre, dim, orbit, reflen, maxiter, tol):
+    '''runs deltafact without series approximation over a list of offsets'''
+    iters = empty(dre.shape[0], int32)
+    for i in prange(dre.shape[0]):
+        iters[i] = deltafact(complex(dre[i], dim[i]), orbit, reflen, 1, 1.0 + 0j, 0j, 0j, maxiter, tol)
+    return iters
+
+def fixglitches(cx, cy, dre, dim, iters, maxiter, prec):
+    '''re-referencing, picks a glitched point as the new reference and reruns only the glitched points against it'''
+    for attempt in range(maxrefs + 1):
+        g = nonzero(iters < 0)[0]
+        if len(g) == 0:
+            break
+        ref = g[len(g) // 2] # middle of the glitched points, usually inside the glitched blob
+        rx = dre[ref]
+        ry = dim[ref]
+        with localcontext() as ctx:
+            ctx.prec = prec
+            orbit, reflen = referenceorbit(Decimal(cx) + Decimal(rx), Decimal(cy) + Decimal(ry), prec, maxiter)
+        tol = glitchtol if attempt < maxrefs else 0.0 # last pass keeps whatever it gets
+        with kernellock:
+            fixed = deltapoints(dre[g] - rx, dim[g] - ry, orbit, reflen, maxiter, tol)
+        if attempt == maxrefs:
+            fixed[fixed < 0] = maxiter
+        iters[g] = fixed
+    return iters
+
+def deeppoints(cx, cy, dre, dim, maxiter, prec):
+    '''returns iterations for a list of offsets from cx, cy, for shapes that aren't a grid'''
+    orbit, reflen = referenceorbit(cx, cy, prec, maxiter)
+    with kernellock:
+        iters = deltapoints(dre, dim, orbit, reflen, maxiter, glitchtol)
+    return fixglitches(cx, cy, dre, dim, iters, maxiter, prec).astype(iterdtype(maxiter))
+
+def mandeldeep(cx, cy, w, h, maxiter, width, height, series = True, vieww = None):
+    '''returns iterations per pixel for a view too deep for float64, cx and cy can be Decimal for extra precision'''
+    prec = refprec(w if vieww is None else vieww) # a strip of a view needs as many digits as the whole view
+    dx = linspace(-.5 * w, .5 * w, width)    # pixel offsets from the centre, these stay accurate at any depth
+    dy = linspace(-.5 * h, .5 * h, height)
+    return mandeldeepat(cx, cy, dx, dy, maxiter, prec, sqrt(.25 * w * w + .25 * h * h) if series else None)
+
+def mandeldeepat(cx, cy, dx, dy, maxiter, prec, r):
+    '''mandeldeep over the offsets dx by dy from cx, cy with the series skip worked out for offsets up to r, or none if r is None,
+    a tile of an image takes its offsets and r from the whole image so it lands on the same samples and skip as a single render'''
+    orbit, reflen = referenceorbit(cx, cy, prec, maxiter)
+    if r is not None:
+        skip, sa, sb, sc = seriesskip(orbit, reflen, r, maxiter)
+    else:
+        skip, sa, sb, sc = 1, 1.0 + 0j, 0j, 0j
+    with kernellock:
+        iters = deltagrid(dx, dy, orbit, reflen, skip, sa, sb, sc, maxiter, glitchtol)
+    gx, gy = nonzero(iters < 0)
+    iters[gx, gy] = fixglitches(cx, cy, dx[gx], dy[gy], iters[gx, gy], maxiter, prec)
+    return iters.astype(iterdtype(maxiter))
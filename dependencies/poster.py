@@ -0,0 +1,255 @@
+from collections import deque
+from json import dump, load
+from os import path, remove, rename
+from struct import pack
+from zlib import compressobj, crc32
+
+from numpy import (arange, array, broadcast_arrays, empty, memmap, minimum,
+                   nonzero, pad, uint8, uint16, zeros)
+
+from colors import colorize, cols, lookup
+from iterstore import iterWriter
+
+postertile = 256    # output pixels along each side of a tile, memory use follows this instead of the image size
+postermargin = 4    # pixels of the neighbouring tiles resized along with a tile, the LANCZOS filter reaches 3 out
+adaptiveaa = True   # only supersamples pixels whose neighbours differ, the rest repeat one sample
+aaitertol = 2       # iteration spread over a pixel's 3x3 neighbourhood above which it gets supersampled
+aacolortol = 12     # same for the largest channel spread under the palette, out of 255
+
+
+class pngWriter:
+    '''writes an RGB png a block of rows at a time so the whole image never has to be in memory'''
+    def __init__(self, name, width, height):
+        self.file = open(name, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.chunk(b'IHDR', pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) # 8 bit RGB
+        self.compressor = compressobj(6)
+
+    def chunk(self, kind, data):
+        self.file.write(pack('>I', len(data)) + kind + data + pack('>I', crc32(kind + data) & 0xffffffff))
+
+    def rows(self, rgb):
+        '''appends a (rows, width, 3) uint8 block under the rows already written'''
+        line = rgb.reshape(rgb.shape[0], -1)
+        data = empty((line.shape[0], line.shape[1] + 1), uint8)
+        data[:, 0] = 1 # sub filter, each byte is stored as the difference from the same channel one pixel left
+        data[:, 1:4] = line[:, :3]
+        data[:, 4:] = line[:, 3:] - line[:, :-3]
+        out = self.compressor.compress(data.tobytes())
+        if out:
+            self.chunk(b'IDAT', out)
+
+    def close(self):
+        self.chunk(b'IDAT', self.compressor.flush())
+        self.chunk(b'IEND', b'')
+        self.file.close()
+
+def checkpoint(state, progress):
+    '''saves progress next to the store, through a rename so an interrupt can't leave half a file'''
+    with open(state + '.tmp', 'w') as f:
+        dump(progress, f)
+    rename(state + '.tmp', state)
+
+def spread(near):
+    '''largest minus smallest value over each 3x3 neighbourhood, near has a one pixel border that gets used up'''
+    w, h = near.shape[0] - 2, near.shape[1] - 2
+    shifted = array([near[i:i + w, j:j + h] for i in range(3) for j in range(3)])
+    return shifted.max(0) - shifted.min(0)
+
+def refineplan(base, colors, x, y, tw, th, aa):
+    '''the supersampled block for a tile with every pixel repeating its base sample, and which of its pixels to supersample,
+    the ones whose 3x3 neighbourhood in the base pass changes by more than aaitertol iterations or aacolortol under the palette
+    and the pixels next to those, a filament thinner than a pixel can miss every base sample around it and only show up beside them'''
+    x0, x1, y0, y1 = max(x - 2, 0), min(x + tw + 2, base.shape[0]), max(y - 2, 0), min(y + th + 2, base.shape[1])
+    near = pad(array(base[x0:x1, y0:y1]), ((2 - x + x0, x + tw + 2 - x1), (2 - y + y0, y + th + 2 - y1)), 'edge') # edges copy outwards
+    busy = (spread(near) > aaitertol) | (spread(lookup(near, colors)).max(2) > aacolortol)
+    return near[2:-2, 2:-2].repeat(aa, 0).repeat(aa, 1), grow(busy)[1:-1, 1:-1]
+
+def subsamples(busy, aa):
+    '''the pixels set in busy and the positions of all their supersamples in the tile's block, pixel by pixel'''
+    px, py = nonzero(busy)
+    sub = arange(aa)
+    sx, sy = broadcast_arrays((px * aa)[:, None, None] + sub[None, :, None], (py * aa)[:, None, None] + sub[None, None, :])
+    return px, py, sx.ravel(), sy.ravel()
+
+def lively(samples, colors):
+    '''which rows of samples, each the supersamples of one pixel, spread by more than aaitertol iterations or aacolortol under the palette,
+    which only reaches the highest count of the base pass'''
+    live = samples.max(1) - samples.min(1) > aaitertol
+    rest = nonzero(~live)[0] # the colors only get looked at where the iterations didn't already settle it
+    shades = lookup(minimum(samples[rest], len(colors) - 1), colors)
+    live[rest] = (shades.max(1) - shades.min(1)).max(1) > aacolortol
+    return live
+
+def grow(mask):
+    '''mask with the pixels next to every set one set too'''
+    return spread(pad(mask, 1, 'constant').astype(uint8)).astype(bool) | mask
+
+def refinemore(block, busy, points, palette, x, y, aa):
+    '''follows what the supersamples of a tile's busy pixels found into the pixels around them, a filament the base pass missed
+    shows up as a refined pixel whose samples differ and gets the pixels next to it refined too, round after round until one finds
+    nothing new, these run through points here as a farm only takes one map at a time'''
+    more = busy
+    while more.any():
+        px, py, sx, sy = subsamples(more, aa)
+        if more is not busy:
+            block[sx, sy] = points(sx + x * aa, sy + y * aa)
+        live = zeros(busy.shape, bool)
+        live[px, py] = lively(block[sx, sy].reshape(len(px), aa * aa), palette)
+        more = grow(live) & ~busy
+        busy |= more
+    return block
+
+def dispatch(samples, points, kind, args):
+    '''runs one of the calls posterimg makes, 'samples' or 'points' with their arguments, the same way here or on a farm worker'''
+    if kind == 'samples':
+        return samples(*args)
+    xs, ys = args
+    return points(xs, ys) if len(xs) else empty(0, uint16)
+
+def record(progress, block):
+    '''widens the iteration range kept in progress to cover a block, 0 is the set and doesn't count, continuous counts
+    widen it to the whole counts around them'''
+    inside = block[block != 0]
+    if len(inside):
+        progress['maximum'] = max(progress['maximum'], int(inside.max()))
+        progress['minimum'] = min(progress['minimum'] or int(inside.min()), int(inside.min()))
+
+def storeblocks(iters, aa):
+    '''read for posterbands out of the supersampled iterations of the whole image'''
+    return lambda x0, x1, y0, y1: iters[x0 * aa:x1 * aa, y0 * aa:y1 * aa]
+
+def closestore(store):
+    '''lets go of a memmap's file before it gets removed, windows can't remove a file that is still mapped'''
+    if store is not None and store._mmap is not None:
+        store._mmap.close()
+
+def posterbands(read, res, aa, colors, name):
+    '''colors and downsamples an image a band of tiles at a time and writes it to name, read(x0, x1, y0, y1) returns the
+    supersampled iterations under that block of output pixels'''
+    from PIL import Image
+    out = pngWriter(name + '.part', res[0], res[1])
+    for y in range(0, res[1], postertile):
+        th = min(postertile, res[1] - y)
+        band = empty((th, res[0], 3), uint8)
+        cy0, cy1 = max(y - postermargin, 0), min(y + th + postermargin, res[1])
+        for x in range(0, res[0], postertile):
+            tw = min(postertile, res[0] - x)
+            cx0, cx1 = max(x - postermargin, 0), min(x + tw + postermargin, res[0])
+            img = Image.fromarray(colorize(read(cx0, cx1, cy0, cy1), colors), "RGB")
+            band[:, x:x + tw] = array(img.resize((cx1 - cx0, cy1 - cy0), Image.LANCZOS))[y - cy0:y - cy0 + th, x - cx0:x - cx0 + tw]
+        out.rows(band)
+    out.close()
+    rename(name + '.part', name)
+
+def posterimg(samples, res, aa, number, noise, name, job, points = None, keep = None, remote = None, dtype = 'uint16'):
+    '''renders an image tile by tile through an iteration store on disk and writes it as it goes
+
+    samples(x, y, width, height, stride) returns the iterations for a block of the supersampled image, every stride-th sample
+    from x, y on, job is anything json can hold that tells renders apart, an interrupted render with the same name and job picks up
+    where it stopped, points(xs, ys) returns the iterations at arrays of sample positions and turns on adaptive supersampling,
+    keep is the file name and metadata to save the iterations under for recolorimg, remote(calls) yields the results of an
+    iterable of (kind, args) calls as dispatch would in order but computes them somewhere else, dtype names the numpy type the
+    iterations are kept in, wide enough for the highest count or a float for continuous ones'''
+    from tqdm import tqdm
+    width, height = res[0] * aa, res[1] * aa
+    adaptive = adaptiveaa and aa > 1 and points is not None
+    store, basestore, state = name + '.iters', name + '.base', name + '.json'
+    tiles = [(x, y) for y in range(0, res[1], postertile) for x in range(0, res[0], postertile)]
+    progress = None
+    if path.exists(store) and path.exists(state):
+        with open(state) as f:
+            progress = load(f)
+        if progress['job'] != job or progress['size'] != [width, height] or progress.get('adaptive', False) != adaptive \
+           or progress.get('dtype', 'uint16') != dtype:
+            progress = None # left over from a different render
+    if progress is None:
+        progress = {'job': job, 'size': [width, height], 'adaptive': adaptive, 'dtype': dtype, 'based': 0, 'done': 0, 'minimum': 0, 'maximum': 0}
+        iters = memmap(store, dtype, 'w+', shape = (width, height))
+        base = memmap(basestore, dtype, 'w+', shape = tuple(res)) if adaptive else None
+    else:
+        iters = memmap(store, dtype, 'r+', shape = (width, height))
+        base = memmap(basestore, dtype, 'r+', shape = tuple(res)) if adaptive else None
+
+    run = remote or (lambda calls: (dispatch(samples, points, kind, args) for kind, args in calls))
+    size = lambda x, y: (min(postertile, res[0] - x), min(postertile, res[1] - y))
+    if adaptive:
+        # one sample per pixel from the middle of where its supersamples go, decides which pixels need the rest
+        todo = tiles[progress['based']:]
+        blocks = run(('samples', (x * aa + aa // 2, y * aa + aa // 2) + size(x, y) + (aa,)) for x, y in todo)
+        for x, y in tqdm(todo):
+            tw, th = size(x, y)
+            block = next(blocks)
+            base[x:x + tw, y:y + th] = block
+            record(progress, block)
+            base.flush()
+            progress['based'] += 1
+            if progress['based'] == len(tiles):
+                progress['palette'] = [progress['minimum'], progress['maximum']] # kept so a restart makes the same choices
+            checkpoint(state, progress)
+        palette = cols(number, progress['palette'][1] + 1, noise, progress['palette'][0])
+
+    # iterations, tiles go in order so the number done is all a restart needs
+    todo = tiles[progress['done']:]
+    plans = deque() # blocks waiting for the samples of their busy pixels
+    def calls(base):
+        for x, y in todo:
+            tw, th = size(x, y)
+            if adaptive:
+                block, busy = refineplan(base, palette, x, y, tw, th, aa)
+                px, py, sx, sy = subsamples(busy, aa)
+                plans.append((block, busy, sx, sy))
+                yield 'points', (sx + x * aa, sy + y * aa)
+            else:
+                yield 'samples', (x * aa, y * aa, tw * aa, th * aa)
+    blocks = run(calls(base))
+    for x, y in tqdm(todo):
+        tw, th = size(x, y)
+        block = next(blocks)
+        if adaptive:
+            filled, busy, sx, sy = plans.popleft()
+            filled[sx, sy] = block
+            block = refinemore(filled, busy, points, palette, x, y, aa)
+        iters[x * aa:(x + tw) * aa, y * aa:(y + th) * aa] = block
+        record(progress, block)
+        iters.flush()
+        progress['done'] += 1
+        checkpoint(state, progress)
+
+    if keep is not None: # one member per tile so recoloring only ever holds a couple of rows of them
+        kept = iterWriter(*keep)
+        for x, y in tiles:
+            tw, th = min(postertile, res[0] - x), min(postertile, res[1] - y)
+            kept.add(str(x) + '_' + str(y), array(iters[x * aa:(x + tw) * aa, y * aa:(y + th) * aa]))
+        kept.close(kind = 'image', res = list(res), aa = aa, tile = postertile, dtype = dtype, minimum = progress['minimum'], maximum = progress['maximum'])
+
+    # coloring and downsampling, cheap next to the iterations so it just reruns after an interrupt
+    colors = cols(number, progress['maximum'] + 1, noise, progress['minimum'])
+    posterbands(storeblocks(iters, aa), res, aa, colors, name)
+    closestore(iters)
+    closestore(base)
+    remove(store)
+    if adaptive:
+        remove(basestore)
+    remove(state)
+
+def recolorimg(store, number, noise, name, highlight = -1):
+    '''writes a new png out of an image's kept iterations with another palette, only the coloring and downsampling run again'''
+    meta = store.meta
+    res, aa, tile = meta['res'], meta['aa'], meta['tile']
+    loaded = {} # tiles read so far, dropped once the bands have moved past them
+
+    def read(x0, x1, y0, y1):
+        for key in [key for key in loaded if key[1] + tile <= y0]:
+            del loaded[key]
+        block = empty(((x1 - x0) * aa, (y1 - y0) * aa), meta.get('dtype', 'uint16'))
+        for ty in range(y0 // tile * tile, y1, tile):
+            for tx in range(x0 // tile * tile, x1, tile):
+                if (tx, ty) not in loaded:
+                    loaded[(tx, ty)] = store.get(str(tx) + '_' + str(ty))
+                ox0, ox1, oy0, oy1 = max(x0, tx), min(x1, tx + tile), max(y0, ty), min(y1, ty + tile)
+                block[(ox0 - x0) * aa:(ox1 - x0) * aa, (oy0 - y0) * aa:(oy1 - y0) * aa] = \
+                    loaded[(tx, ty)][(ox0 - tx) * aa:(ox1 - tx) * aa, (oy0 - ty) * aa:(oy1 - ty) * aa]
+        return block
+
+    posterbands(read, res, aa, cols(number, meta['maximum'] + 1, noise, meta['minimum'], highlight), name)
@@ -0,0 +1,32 @@
+from os import path
+
+from functions import framecolor, iterframes
+from iterstore import iterReader
+from kernels import kernelversion
+from poster import recolorimg
+from stream import writeframes
+
+
+def recolorname(name, number):
+    '''where a recolored copy goes by default, next to the store with the color mode in the name'''
+    meta = iterReader(name).meta
+    return path.splitext(name)[0] + ' color ' + str(number) + ('.png' if meta['kind'] == 'image' else '.mp4')
+
+def recolor(name, number, noise, highlight = -1, out = None):
+    '''makes a new image or animation out of a store of kept iterations, only the palette and resize stages run again, returns the file name'''
+    from tqdm import tqdm
+    store = iterReader(name)
+    meta = store.meta
+    out = out or recolorname(name, number)
+    if meta['kernel'] != kernelversion:
+        print("Iterations were kept with kernel version " + str(meta['kernel']) + ", rendering again may not match")
+    if meta['kind'] == 'image':
+        recolorimg(store, number, noise, out, highlight)
+    elif meta['kind'] == 'frames':
+        keys = [key for key in store.keys() if key.startswith('frame_')]
+        writeframes((framecolor(store.get(key), number, noise, highlight) for key in tqdm(keys)), out, meta['fps'])
+    elif meta['kind'] == 'iterations':
+        writeframes(iterframes(store.get('iters'), meta['res'], number, noise, meta['mode']), out, meta['fps'])
+    else:
+        raise ValueError('unknown kind of store ' + str(meta['kind']))
+    return out
@@ -0,0 +1,85 @@
+from multiprocessing import Pool, cpu_count
+from threading import Thread
+
+import farm
+
+try:
+    from queue import Queue
+except ImportError: # python 2
+    from Queue import Queue
+
+try:
+    from numba import set_num_threads
+except ImportError: # numba before 0.49 fixes the thread count when it is imported, each pool process keeps every core
+    set_num_threads = lambda n: None
+
+writeahead = 8      # frames that can wait for the encoder before rendering has to pause
+poolworkers = None  # processes poolframes starts, None for one per core and 1 to render in this process
+
+
+def runjob(job):
+    '''unpacks a job inside a worker process'''
+    return job[0](*job[1])
+
+def single():
+    '''the pool already has a process per core so the kernels in each one get a single thread, numba before 0.49 can't do
+    that and they share the cores instead, which is slower but gives the same frames'''
+    set_num_threads(1)
+
+def poolframes(render, jobs, workers = None, ahead = None):
+    '''renders render(*args) for every args in jobs on a process pool and yields the results in order'''
+    from tqdm import tqdm
+    jobs = list(jobs)
+    if farm.farmaddress is not None: # frames go out to the render farm's workers instead
+        for frame in tqdm(farm.sharedfarm().map(render, jobs), total = len(jobs)):
+            yield frame
+        return
+    workers = workers or poolworkers or cpu_count()
+    if workers == 1: # no pool, also what a process that is itself a pool worker has to do
+        for job in tqdm(jobs):
+            yield render(*job)
+        return
+    ahead = ahead or workers * 2 # frames in flight or finished early, this is what keeps memory bounded
+    pool = Pool(workers, single)
+    try:
+        pending = {} # frames finish in any order and wait here until it is their turn
+        for i in range(min(ahead, len(jobs))):
+            pending[i] = pool.apply_async(runjob, ((render, jobs[i]),))
+        for i in tqdm(range(len(jobs))):
+            frame = pending.pop(i).get()
+            if i + ahead < len(jobs):
+                pending[i + ahead] = pool.apply_async(runjob, ((render, jobs[i + ahead]),))
+            yield frame
+    finally:
+        pool.terminate()
+
+def writeframes(frames, animname, fps, keep = None):
+    '''writes RGB frames to a video from a separate thread so encoding runs alongside rendering, keep is a folder to also save them to as pngs'''
+    from imageio import get_writer, imwrite
+    queue = Queue(writeahead)
+    errors = []
+
+    def write():
+        try:
+            with get_writer(animname, mode = 'I', fps = fps) as writer:
+                image = queue.get()
+                while image is not None:
+                    writer.append_data(image)
+                    image = queue.get()
+        except Exception as e:
+            errors.append(e)
+            while queue.get() is not None: # keeps draining so the renderer never blocks on a dead writer
+                pass
+
+    thread = Thread(target = write)
+    thread.start()
+    try:
+        for number, image in enumerate(frames):
+            if keep is not None:
+                imwrite(keep + str(number) + '.png', image)
+            queue.put(image)
+    finally:
+        queue.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,111 @@
+import sys
+
+from numpy import array, concatenate, nonzero, ones, uint32, uint64
+
+jump = 8 # unchanged cells shorter than this are cheaper to rewrite than to jump over with the cursor
+halfblock = False       # draws two pixels a cell with the upper half block, the top one as the foreground and the bottom one as the background
+colormode = 'truecolor' # truecolor, 256 or 16, the last two send a palette index instead of three channels for shorter escapes
+colormodes = ('truecolor', '256', '16')
+
+cubelevels = array([0, 95, 135, 175, 215, 255]) # channel values of the xterm 6x6x6 color cube
+basic = array([(0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+               (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255)]) # xterm's 16 colors
+
+
+def quantize(rgb, mode):
+    '''one int per pixel for a (rows, columns, 3) uint8 array, packed channels for truecolor and the nearest palette index otherwise'''
+    if mode == 'truecolor':
+        return (rgb[:, :, 0].astype(uint32) << 16) | (rgb[:, :, 1].astype(uint32) << 8) | rgb[:, :, 2]
+    rgb = rgb.astype(int)
+    if mode == '16':
+        return ((rgb[:, :, None, :] - basic) ** 2).sum(axis = 3).argmin(axis = 2).astype(uint32)
+    # nearest cube color and nearest gray, whichever is closer
+    level = (abs(rgb[:, :, :, None] - cubelevels)).argmin(axis = 3)
+    cube = 16 + 36 * level[:, :, 0] + 6 * level[:, :, 1] + level[:, :, 2]
+    cubeerror = ((cubelevels[level] - rgb) ** 2).sum(axis = 2)
+    step = ((rgb.sum(axis = 2) // 3 - 3) // 10).clip(0, 23) # grays run from 8 to 238 in steps of 10
+    grayerror = ((8 + 10 * step[:, :, None] - rgb) ** 2).sum(axis = 2)
+    return ((cube * (cubeerror <= grayerror)) + ((232 + step) * (cubeerror > grayerror))).astype(uint32)
+
+def code(color, mode, fg):
+    '''the sgr parameters that set the foreground or background to a color from quantize'''
+    if mode == 'truecolor':
+        return ('38;2;' if fg else '48;2;') + str(color >> 16) + ';' + str((color >> 8) & 255) + ';' + str(color & 255)
+    if mode == '256':
+        return ('38;5;' if fg else '48;5;') + str(color)
+    return str((30 if fg else 40) + color if color < 8 else (90 if fg else 100) + color - 8)
+
+def digits(values):
+    '''total decimal digits of an array of non-negative ints below 1000'''
+    return int(values.size + (values >= 10).sum() + (values >= 100).sum())
+
+
+class frameEncoder:
+    '''keeps the last frame drawn to the terminal and only sends the cells that changed'''
+    def __init__(self, half = None, mode = None):
+        self.halfblock = halfblock if half is None else half
+        self.mode = colormode if mode is None else mode
+        self.rows = 2 if self.halfblock else 1 # pixel rows drawn in each row of cells
+        self.prev = None
+        self.bytes = 0      # bytes written for the last frame
+        self.fullbytes = 0  # bytes the last frame would have cost printing every cell
+
+    def reset(self):
+        # forgets the last frame, used when something else has drawn over the screen
+        self.prev = None
+
+    def draw(self, rgb):
+        '''draws a (rows, columns, 3) uint8 array starting at the top left, in half block mode that is two rows of pixels per row of cells'''
+        colors = quantize(rgb, self.mode)
+        if self.halfblock: # top and bottom pixel packed into one int so a cell compares in one go
+            key = (colors[0::2].astype(uint64) << 32) | colors[1::2]
+        else:
+            key = colors
+        height, width = key.shape
+        if self.prev is None or self.prev.shape != key.shape:
+            changed = ones(key.shape, bool) # everything has to be drawn
+        else:
+            changed = key != self.prev
+
+        out = []
+        fg, bg = -1, -1 # colors the terminal is currently set to, unknown at the start of a frame
+        for y in nonzero(changed.any(axis=1))[0]:
+            xs = nonzero(changed[y])[0]
+            # splitting the changed cells into runs, bridging gaps that are cheaper to rewrite than to skip
+            gaps = nonzero(xs[1:] - xs[:-1] > jump)[0]
+            starts = concatenate(([xs[0]], xs[gaps + 1]))
+            ends = concatenate((xs[gaps] + 1, [xs[-1] + 1]))
+            for start, end in zip(starts, ends):
+                out.append(u'\u001b[' + str(y + 1) + ';' + str(start + 1) + 'H')
+                row = key[y, start:end]
+                cuts = nonzero(row[1:] != row[:-1])[0] + 1 # where the color changes inside the run
+                bounds = concatenate(([0], cuts, [end - start]))
+                for i in range(len(bounds) - 1):
+                    cell = int(row[bounds[i]])
+                    top, bottom = (cell >> 32, cell & 0xffffffff) if self.halfblock else (cell, cell)
+                    half = top != bottom # a cell with both halves the same is a space, which leaves the foreground alone
+                    codes = []
+                    if half and top != fg:
+                        codes.append(code(top, self.mode, True))
+                        fg = top
+                    if bottom != bg: # only sends a new color code when the color actually changes
+                        codes.append(code(bottom, self.mode, False))
+                        bg = bottom
+                    if codes:
+                        out.append(u'\u001b[' + ';'.join(codes) + 'm')
+                    out.append((u'\u2580' if half else u' ') * (bounds[i + 1] - bounds[i]))
+        out.append(u'\u001b[0m\u001b[' + str(height + 1) + ';1H') # leaves the cursor on the line under the frame
+
+        frame = u''.join(out)
+        sys.stdout.write(frame) # whole frame in one write
+        sys.stdout.flush()
+        self.prev = key
+        self.bytes = len(frame.encode('utf-8'))
+        # what printing every cell as its own escape would have cost, the escape and glyph plus the digits of each color
+        if self.mode == 'truecolor':
+            perpixel, values = 7, rgb # 48;2; and two semicolons
+        else:
+            perpixel, values = (5, colors) if self.mode == '256' else (0, colors + 40 + 52 * (colors >= 8)) # 48;5; or just the 40 or 100 code
+        glyph = 3 if self.halfblock else 1 # the half block takes three bytes of utf-8
+        self.fullbytes = int(height * width * (glyph + 3 * self.rows) + perpixel * colors.size + digits(values))
+        return self.bytes
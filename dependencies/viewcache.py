@@ -0,0 +1,114 @@
+from decimal import ROUND_FLOOR, Decimal
+
+from numpy import empty, minimum, nonzero
+
+from kernels import iterdtype
+
+
+def lattice(c, step):
+    '''index of the first lattice point at or below c, Decimal so deep centres keep their digits'''
+    return int((Decimal(c) / Decimal(step)).to_integral_value(rounding = ROUND_FLOOR))
+
+class viewCache:
+    '''keeps the last supersampled iteration grid so pans only compute the strips that came into view
+
+    samples is called as samples(cx, cy, w, h, maxiter, width, height, vieww, viewsize, progress) and returns raw iterations
+    per sample, vieww and viewsize being the width and samples across of the whole grid a strip is part of, the grid is
+    kept lined up to whole sample steps so every pan is an exact shift of it, with points(cx, cy, w, h, maxiter, width,
+    height, xs, ys, vieww) for just the samples at columns xs and rows ys of that grid a higher budget only iterates the
+    samples that hadn't escaped under the old one'''
+    def __init__(self, samples, points = None):
+        self.samples = samples
+        self.points = points
+        self.grid = None
+        self.key = None     # (w, h, width, height) the grid was made for
+        self.maxiter = 0
+        self.kx = 0         # lattice index of the first column and row
+        self.ky = 0
+        self.computed = 0   # samples computed for the last frame
+        self.progress = None # passed on to samples, lets a render be stopped part way through
+
+    def reset(self):
+        self.grid = None
+
+    def place(self, kx, ky, width, height):
+        '''centre and size of a block of samples starting at lattice point (kx, ky)'''
+        stepx, stepy = self.key[0] / (self.key[2] - 1), self.key[1] / (self.key[3] - 1)
+        cx = (Decimal(kx) + Decimal(width - 1) / 2) * Decimal(stepx)
+        cy = (Decimal(ky) + Decimal(height - 1) / 2) * Decimal(stepy)
+        return cx, cy, stepx * (width - 1), stepy * (height - 1)
+
+    def strip(self, kx, ky, width, height):
+        '''computes a block of samples starting at lattice point (kx, ky)'''
+        cx, cy, w, h = self.place(kx, ky, width, height)
+        self.computed += width * height
+        return self.samples(cx, cy, w, h, self.maxiter, width, height, self.key[0], self.key[2], self.progress)
+
+    def deepen(self, maxiter):
+        '''the grid at a higher budget, samples that escaped keep their counts and the ones still at the old budget are iterated again'''
+        xs, ys = nonzero(self.grid >= self.maxiter)
+        grid = self.grid.astype(iterdtype(maxiter)) # a copy as the grid can be shared with a bookmark cache, widened if the budget needs it
+        if xs.size: # the samples as strip would have made them for the whole grid
+            width, height = self.key[2], self.key[3]
+            cx, cy, w, h = self.place(self.kx, self.ky, width, height)
+            grid[xs, ys] = self.points(cx, cy, w, h, maxiter, width, height, xs, ys, self.key[0])
+            self.computed += xs.size
+        return grid
+
+    def cached(self, w, h, maxiter, width, height):
+        '''whether get can make this view out of the last grid instead of starting over'''
+        return self.grid is not None and self.key == (w, h, width, height) and (maxiter <= self.maxiter or self.points is not None)
+
+    def put(self, cx, cy, w, h, maxiter, grid):
+        '''takes a grid get made for this view somewhere else, so getting the view next has nothing to compute'''
+        width, height = grid.shape
+        self.key = (w, h, width, height)
+        self.maxiter = maxiter
+        self.kx = lattice(cx, w / (width - 1)) - (width - 1) // 2
+        self.ky = lattice(cy, h / (height - 1)) - (height - 1) // 2
+        self.grid = grid
+
+    def get(self, cx, cy, w, h, maxiter, width, height, progress = None):
+        '''returns the (width, height) sample grid for the view, reusing whatever it can from the last one
+
+        if progress raises the grid stays as it was, or is dropped if it was being made from scratch'''
+        key = (w, h, width, height)
+        self.progress = progress
+        kx = lattice(cx, w / (width - 1)) - (width - 1) // 2
+        ky = lattice(cy, h / (height - 1)) - (height - 1) // 2
+        sx = kx - self.kx
+        sy = ky - self.ky
+        self.computed = 0
+
+        if self.grid is None or key != self.key or (maxiter > self.maxiter and self.points is None) or abs(sx) >= width or abs(sy) >= height:
+            self.grid = None # nothing left to reuse if this gets interrupted
+            self.key = key
+            self.maxiter = maxiter
+            self.grid = self.strip(kx, ky, width, height)
+        else:
+            if maxiter < self.maxiter: # fewer iterations just cuts off the ones that went further
+                self.grid = minimum(self.grid, maxiter)
+                self.maxiter = maxiter
+            elif maxiter > self.maxiter: # done before the shift, the grid is still where kx and ky say
+                self.grid = self.deepen(maxiter)
+                self.maxiter = maxiter
+            if sx or sy:
+                grid = empty(self.grid.shape, self.grid.dtype)
+                # shifting the part that is still in view
+                grid[max(0, -sx):width - max(0, sx), max(0, -sy):height - max(0, sy)] = \
+                    self.grid[max(0, sx):width - max(0, -sx), max(0, sy):height - max(0, -sy)]
+                # columns that came into view, full height
+                if sx > 0:
+                    grid[width - sx:, :] = self.strip(kx + width - sx, ky, sx, height)
+                elif sx < 0:
+                    grid[:-sx, :] = self.strip(kx, ky, -sx, height)
+                # rows that came into view, only over the columns that were already there
+                x0, x1 = max(0, -sx), width - max(0, sx)
+                if sy > 0:
+                    grid[x0:x1, height - sy:] = self.strip(kx + x0, ky + height - sy, x1 - x0, sy)
+                elif sy < 0:
+                    grid[x0:x1, :-sy] = self.strip(kx + x0, ky, x1 - x0, -sy)
+                self.grid = grid
+        self.kx = kx
+        self.ky = ky
+        return self.grid
@@ -0,0 +1,29 @@
+from __future__ import print_function
+
+import sys
+from argparse import ArgumentParser
+from json import loads
+from os import mkdir, path
+
+from dependencies.batch import farm, runbatch # the farm module the renderers read, not a second copy of it
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'renders a json list of jobs without the interactive loop')
+    parser.add_argument('jobs', help = 'json file holding a list of job specs')
+    parser.add_argument('-w', '--workers', type = int, default = None, help = 'jobs rendered at once, one per core by default')
+    parser.add_argument('-m', '--manifest', default = 'manifest.json', help = 'json file the results get written to')
+    parser.add_argument('-b', '--bookmarks', default = 'Bookmarks.json', help = 'bookmark file the job specs can refer to')
+    parser.add_argument('--farm', default = None, metavar = 'HOST:PORT', help = 'renders every job on mandelworker.py processes connecting here, one job at a time, '
+                        'an empty host only takes workers on this machine')
+    parser.add_argument('--farmkey', default = None, help = 'shared secret the workers have to give, made up and printed if not given')
+    args = parser.parse_args()
+    if args.farm:
+        farm.farmaddress = farm.parseaddress(args.farm)
+        farm.farmkey = args.farmkey.encode('ascii') if args.farmkey else None
+
+    for folder in ["./images/", "./zoomcache/", "./itercache/", "./janimcache/", "./anim/"]: # same folders the interactive loop uses
+        if not path.isdir(folder): mkdir(folder)
+    entries = runbatch(loads(open(args.jobs).read()), args.workers, args.manifest, args.bookmarks)
+    failed = [entry for entry in entries if entry['status'] != 'done']
+    print(str(len(entries) - len(failed)) + " of " + str(len(entries)) + " jobs rendered, results in " + args.manifest)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,33 @@
+from __future__ import print_function
+
+import sys
+from argparse import ArgumentParser
+from json import dumps, loads
+
+from dependencies.bench import compare, runbench
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'times the renderer over the bookmarks and a few fixed views')
+    commands = parser.add_subparsers(dest = 'command')
+    run = commands.add_parser('run', help = 'runs the suite and writes the results as json')
+    run.add_argument('-o', '--output', default = 'bench.json', help = 'json file the results get written to')
+    run.add_argument('-b', '--bookmarks', default = 'Bookmarks.json', help = 'bookmark file to take views from')
+    run.add_argument('-c', '--case', action = 'append', help = 'only runs cases with this in their name, can be given more than once')
+    check = commands.add_parser('compare', help = 'compares two result files, exits with 1 if anything got slower')
+    check.add_argument('old')
+    check.add_argument('new')
+    check.add_argument('-t', '--tolerance', type = float, default = None, help = 'fraction a stage can slow down by before it counts')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        report = runbench(args.bookmarks, args.case)
+        open(args.output, 'w').write(dumps(report, sort_keys = True, indent = 4))
+        for case in sorted(report['cases']):
+            for name, result in sorted(report['cases'][case].items()):
+                print(case + ' / ' + name + ': ' + (str(result['seconds']) + 's' if 'seconds' in result else result['error']))
+    elif args.command == 'compare':
+        lines, regressed = compare(loads(open(args.old).read()), loads(open(args.new).read()), args.tolerance)
+        print('\n'.join(lines))
+        sys.exit(1 if regressed else 0)
+    else:
+        parser.print_help()
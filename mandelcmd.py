@@ -1,193 +1,408 @@
 from __future__ import print_function
 
+from timeit import default_timer
+
+launched = default_timer() # before the imports so the time to the first frame counts them
+
 import sys
 import tty
+from argparse import ArgumentParser
+from decimal import Decimal, InvalidOperation, getcontext
 from json import dumps, loads
 from math import floor, log10, sqrt
-from os import mkdir, path, popen, remove, system
+from os import mkdir, path, popen, read, remove, system
+from select import select
+from threading import Thread
 from time import sleep
 
-from imageio import get_writer, imread, imwrite, mimsave
-from matplotlib import cm
-from numba import autojit, jit, prange
+# everything only the image, animation and bookmark menus need gets imported when they are first opened
 from numpy import (array, clip, empty, fliplr, float64, linspace, logspace,
                    percentile, ravel, remainder, swapaxes, uint8, uint16,
                    zeros)
-from pick import pick
-from PIL import Image, ImageFilter
-from tqdm import tqdm
 
-from dependencies.colors import cols, noiseColor
-from dependencies.functions import (bookmarks, juliafast, juliaimg, juliapan,
-                                    mandelanimrender, mandelfast, mandelimg,
-                                    ndec)
+from dependencies.atlas import (atlasinset, atlasspan, buildatlas,
+                                loadatlas)
+from dependencies.background import (Cancelled, previewsteps, previewtime,
+                                     renderThread)
+from dependencies import functions, terminal
+from dependencies.colors import colorize, cols, noiseColor
+from dependencies.functions import farm # the farm module the renderers read, not a second copy of it
+from dependencies.functions import (aafour, aatwo, ask, juliabudget,
+                                    juliaimg, juliapan, juliapoints,
+                                    juliaview, mandelanimrender,
+                                    mandelbudget, mandelimg, mandelpoints,
+                                    mandelsamples, ndec, warmkernels)
+from dependencies.hud import frameHud
+from dependencies.kernels import ddwidth, launchthreads
+from dependencies.marks import markCache, markStore, markview, thumbsize
+from dependencies.perturb import refprec
+from dependencies.terminal import colormodes, frameEncoder
+from dependencies.viewcache import viewCache
+
+
+def pixels(grid, rows):
+    '''the iterations for each pixel out of the 2x2 samples per cell, rows is the pixel rows a cell shows
+
+    the samples are reduced here rather than in the kernel as viewCache has to keep them for the next pan'''
+    return aafour(grid) if rows == 1 else aatwo(grid)
 
+def shade(iters, choice, noise):
+    '''colors a (width, height) grid of iterations for the mandelbrot loop, returns (height, width, 3)'''
+    iters = swapaxes(iters, 0, 1).copy()
+    if choice == 0: # off sets iters to the bottom value for grayscale output
+        iters -= iters.min()
+    iters += 1
+    iters %= iters.max()
+    colors = cols(choice, iters.max() + 1, noise) # gets color list for fast printing
+    return colors[iters]
 
-@jit
-def printiters(iters, colors):
-    '''literally just a seperate function to print colors to the command line'''
-    for i in iters:
-        print(u'\u001b[48;2;' + str(colors[i, 0]) + ';' + str(colors[i, 1]) + ';' + str(colors[i, 2]) + 'm ', end='')
+def juliashade(iters, choice, noise):
+    '''same as shade for the julia loop, which has always left out the plus one'''
+    iters = iters.copy()
+    if choice == 0:
+        iters -= iters.min()
+    iters %= max(iters.max(), 1) # everything escaping at once would leave nothing to divide by
+    maximum = iters.max() + 1
+    colors = cols(choice, maximum + 1, noise)
+    return colorize(iters, colors)
 
-def mandelloop():
-    '''main loop for the command line drawing'''
+def inset(rgb, atlas, mx, my, choice, noise, rows = 1):
+    '''draws the julia set for mx, my out of the atlas into the top right corner of a frame with rows pixel rows per cell'''
+    width = min(atlasinset, rgb.shape[1] // 3) # never more than a third of the screen
+    height = width // 2 * rows # cells are about twice as tall as they are wide
+    if height > 0:
+        rgb[:height, -width:] = juliashade(atlas.view(mx, my, 0.0, 0.0, atlasspan, atlasspan, width, height), choice, noise)
+    return rgb
+
+def budgetfor(state, budget, cx, cy, w, h):
+    '''the automatic iteration budget for a view out of budget(cx, cy, w, h), kept through pans of up to half the width and worked out again after a zoom'''
+    at = state['budgetat']
+    if at is None or at[2] != w or abs(at[0] - cx) > Decimal(w / 2) or abs(at[1] - cy) > Decimal(w / 2):
+        state['budget'] = budget(cx, cy, w, h)
+        state['budgetat'] = (cx, cy, w)
+    return state['budget']
+
+def pickmark(marks, cache, choice, noise):
+    '''the bookmark menu, the highlighted bookmark's thumbnail is drawn above the list out of the cache and fills in as soon as
+    the cache has it, returns the name picked, '+ New' or None'''
+    system('printf \\\\033c')
+    frame = frameEncoder()
+    options = marks.names() + ['+ New', 'Cancel']
+    index = 0
+    shown = None # what was drawn last, nothing gets sent again until it changes
+    while 1:
+        rows = int(popen('stty size', 'r').read().split()[0])
+        thumb = cache.get(options[index], 'thumb') if index < len(options) - 2 else None
+        if shown != (index, thumb is None, rows):
+            if thumb is None: # not made yet or not a bookmark, left blank
+                frame.draw(zeros((thumbsize[1] * frame.rows, thumbsize[0], 3), uint8))
+            else:
+                frame.draw(shade(pixels(thumb, frame.rows), choice, noise))
+            top = thumbsize[1] + 2
+            fit = max(rows - top, 1) # options that fit under the thumbnail, the list scrolls to keep the highlighted one in view
+            first = min(max(index - fit // 2, 0), max(len(options) - fit, 0))
+            out = [u'\u001b[0m\u001b[' + str(top) + ';1HChoose a bookmark or make a new one\u001b[0K']
+            for i in range(first, min(first + fit, len(options))):
+                out.append(u'\u001b[' + str(top + 1 + i - first) + ';1H' + (u'\u001b[7m> ' if i == index else u'  ') + options[i] + u'\u001b[0m\u001b[0K')
+            sys.stdout.write(u''.join(out) + u'\u001b[J')
+            sys.stdout.flush()
+            shown = (index, thumb is None, rows)
+        if not select([sys.stdin], [], [], .25)[0]: # looks at the cache again every so often while nothing is pressed
+            continue
+        keys = read(sys.stdin.fileno(), 1024).decode('latin-1')
+        if '\x03' in keys or keys in ('q', '\x1b'):
+            return None
+        if '\r' in keys or '\n' in keys:
+            return None if options[index] == 'Cancel' else options[index]
+        down = keys.count('\x1b[B') + keys.count('s') + keys.count('j') # arrow keys or the loop's own movement keys
+        up = keys.count('\x1b[A') + keys.count('w') + keys.count('k')
+        index = (index + down - up) % len(options)
+
+def mandelloop(hud = None, warm = False, atlas = None):
+    '''main loop for the command line drawing, hud times the frames and warm compiles the image and animation kernels after the first frame,
+    atlas is a juliaAtlas for the inset and the julia loop's first frame'''
     system('printf \\\\033c')  # clearing the screen, works faster than calling system("clear")
     tty.setraw(sys.stdin)  # preparin to take the raw keyboard input
-    # initiating the starting vars
-    cx = -.5
-    cy = 0.0
+    # initiating the starting vars, the centre is a Decimal so panning still works past float64 precision
+    cx = Decimal(-.5)
+    cy = Decimal(0)
     w = 4.5
     maxiters = 100
     waypoints = []
     choice = 0
     noise = noiseColor()
+    frame = frameEncoder() # remembers what is on screen so only changed cells get sent
+    view = viewCache(mandelsamples, mandelpoints) # remembers the last iterations so pans, recolors and higher budgets skip most of the work
+    marks = markStore() # the bookmarks, read once
+    hud = hud or frameHud()
+    state = {'persample': 0.0, 'warm': warm, 'inset': atlas is not None} # seconds per sample of the last frame drawn from scratch, decides whether previews are worth it
+    state.update({'budget': maxiters, 'budgetat': None}) # the last automatic budget and the view it was worked out at
+    state['away'] = False # set while a key hands the terminal to the julia loop or a render, the bookmark cache waits it out
 
-    while 1:  # main loop
+    def render(target, cancelled):
+        '''draws one view on the render thread, coarse previews first when the full frame looks slow'''
+        cx, cy, w, maxiters, choice, note = target
+        def progress(columns):
+            if cancelled(): raise Cancelled()
+        hud.start()
         rows, columns = popen('stty size', 'r').read().split()  # getting size
         height = int(rows) - 1  # setting vars for size
         width = int(columns)
+        cache.resize((width, height))
+        hud.lap('size')
 
         # correcting aspect ratio, command line output is almost exactly a 1:2 aspect ratio
         h = (w * height * 2) / width
-        # setting min and max values for calling mandelfast
-        minx = cx - .5 * w
-        maxx = cx + .5 * w
-        miny = cy - .5 * h
-        maxy = cy + .5 * h
+        getcontext().prec = refprec(w) # enough digits for the centre to move by a fraction of the width, every thread has its own context
+        if functions.autoiters:
+            maxiters = budgetfor(state, mandelbudget, cx, cy, w, h)
+            hud.lap('budget')
+
+        if not view.cached(w, h, maxiters, width * 2, height * 2) and state['persample'] * width * height * 4 > previewtime:
+            for step in previewsteps: # one sample per step by step block of cells, blown up to fill the screen
+                rgb = shade(mandelsamples(cx, cy, w, h, maxiters, -(-width // step), -(-height // step), progress = progress), choice, noise)
+                if cancelled(): raise Cancelled() # the perturbation engine doesn't call progress
+                frame.draw(rgb.repeat(step * frame.rows, 0).repeat(step, 1)[:height * frame.rows, :width])
+                sys.stdout.flush()
+            hud.lap('preview')
 
         # getting per character iterations for printing to console
-        iters = swapaxes(mandelfast(minx, maxx, miny, maxy, maxiters, width, height), 0, 1).ravel() # turns iters into a 1-d array for les for loop nesting
-        if choice == 0: # off sets iters to the bottom value for grayscale output
-            iters -= iters.min()
-        iters += 1
-        iters %= iters.max()
-
-        colors = cols(choice, iters.max() + 1, noise) # gets color list for fast printing
-        sys.stdout.write(u'\u001b[0;1f')  # resetting cursor to top left
-        printiters(iters, colors) # calling compiled function for printing so the only holdup is print speed
+        start = default_timer()
+        grid = view.get(cx, cy, w, h, maxiters, width * 2, height * 2, progress)
+        if view.computed == grid.size:
+            state['persample'] = (default_timer() - start) / grid.size
+        hud.lap('iters')
+        rgb = shade(pixels(grid, frame.rows), choice, noise) # the same samples either way, half blocks just average fewer of them
+        if state['inset']:
+            inset(rgb, atlas, float(cx), float(cy), choice, noise, frame.rows)
+        hud.lap('colors')
+        if cancelled(): raise Cancelled()
+        frame.draw(rgb) # writes only the cells that changed in one go
+        hud.lap('draw')
+        hud.finish(grid, maxiters, view.computed, frame.bytes, frame.fullbytes,
+                   {'loop': 'mandel', 'x': str(cx), 'y': str(cy), 'w': w, 'iters': maxiters, 'width': width, 'height': height, 'choice': choice})
+        if state['warm']:
+            warmer = Thread(target = warmkernels) # compiles while the user looks around instead of on their first render
+            warmer.daemon = True
+            warmer.start()
+            state['warm'] = False
         # making coordinate output to display location to user
         coords = u"\u001b[0mX: " + str(ndec(cx, 5)) + " " * 5 + "Y: " + str(ndec(cy, 5)) + " " * \
             5 + "Width: " + str(ndec(w, 5)) + " " * 5 + \
-            "Iters: " + str(maxiters) + u"\u001b[0K"
+            "Iters: " + str(maxiters) + (" auto" if functions.autoiters else "") + " " * 5 + "Bytes: " + str(frame.bytes) + "/" + str(frame.fullbytes) + hud.line() + u"\u001b[0K"
         print(coords, end=' ' * 5) # prints coords, width and iterations
-        if len(waypoints) == 1: # lets user know if they already have a start point for julia pan animation
-            print("pick second point", end='')
-        key = sys.stdin.read(1)                                                         # gets input character for parsing
-        if ord(key) == 3: break                                     			        # taking raw input so breaking if escape sequence is used
-        elif key == 'a': cx -= w * .1 											        # getting direction inputs
-        elif key == 'A': cx -= w * .05 											        # getting direction inputs
-        elif key == 'd': cx += w * .1 											        # getting direction inputs
-        elif key == 'D': cx += w * .05 											        # getting direction inputs
-        elif key == 'w': cy -= w * .1 											        # getting direction inputs
-        elif key == 'W': cy -= w * .05 											        # getting direction inputs
-        elif key == 's': cy += w * .1 											        # getting direction inputs
-        elif key == 'S': cy += w * .05 											        # getting direction inputs
-        elif key == 'q': w *= .9      											        # getting zoom inputs
-        elif key == 'Q': w *= .95      											        # getting zoom inputs
-        elif key == 'e': w *= 1.1     											        # getting zoom inputs
-        elif key == 'E': w *= 1.05     											        # getting zoom inputs
-        elif key == 'z': maxiters *= .9; maxiters = int(maxiters)   			        # decreasing iters
-        elif key == 'Z': maxiters *= .95; maxiters = int(maxiters)   			        # decreasing iters
-        elif key == 'c': maxiters *= 1.1; maxiters = int(maxiters)  			        # increasing iters
-        elif key == 'C': maxiters *= 1.05; maxiters = int(maxiters)  			        # increasing iters
-        elif key.lower() == 'v': mandelanimrender(cx, cy, w, maxiters, choice, noise)   # calling anim output for current point
-        elif key.lower() == 'i':                                                        # getting pushing current coords to array for julia pan
-            waypoints.append((cx, cy))
-            if len(waypoints) > 1: # if this is the second point calls julia pan with coord list
-                juliapan(waypoints, choice, noise)
-                waypoints = []     # resets coord list
-        elif key.lower() == 'm': choice += 1; choice %= 3                               # switches between the 3 color modes
-        elif key.lower() == 'n': noise.newcolors()                                      # randomizes colors for noise
-        elif key.lower() == ' ': julialoop(cx, cy, choice, noise)     			        # calling anim output for current point
-        elif key.lower() == 'r': cx = -.5; cy = 0; w = 5.0; maxiters = 100  	        # resetting to default values
-        elif key.lower() == 'x': 		
-            try:										                                # getting user input for coords to jump to
-                system('reset') # resets console to print input
-                cx = float(raw_input('CenterX: '))
-                cy = float(raw_input('CenterY: '))
-            except ValueError:
-                pass
-            tty.setraw(sys.stdin) # sets console back to raw to recieve input
-        elif key.lower() == 'b':                                                        # opens bookmark window
-            cx, cy, w, maxiters = bookmarks(cx, cy, w, maxiters)
-            tty.setraw(sys.stdin)
-        elif key.lower() == 'f':                                                        # calling the menu to choose resolution for image output
-            mandelimg(cx, cy, w, maxiters, choice, noise)
-        else:
-            pass														                # if not an accepted input continues loop
+        print(note, end='')
         sys.stdout.flush()
+
+    launchthreads()
+    worker = renderThread(render)
+    cache = markCache(marks, mandelsamples, idle = lambda: not worker.busy and not state['away']) # renders the bookmarks in the background while nothing else is
+    while 1:  # main loop
+        # lets user know if they already have a start point for julia pan animation
+        worker.show((cx, cy, w, maxiters, choice, "pick second point" if len(waypoints) == 1 else ''))
+        # everything typed since the last read comes in at once and gets folded into the one view drawn next
+        keys = read(sys.stdin.fileno(), 1024).decode('latin-1')
+        if '\x03' in keys: break                                                       # taking raw input so breaking if escape sequence is used
+        for key in keys:
+            getcontext().prec = refprec(w) # the pans below run on this thread, its context needs the digits as much as the render thread's
+            if key.lower() in 'vibxf ': worker.cancel()                                 # these write to the terminal themselves
+            state['away'] = key.lower() in 'vif '                                       # these render on this thread, the menu keeps the cache going for its thumbnails
+            if functions.autoiters:
+                maxiters = state['budget'] # images, animations and bookmarks made from here get the budget the frame was drawn with
+                if key in 'zZcC': functions.autoiters = False # changing it by hand turns the automatic budget off
+            if key == 'a': cx -= Decimal(w * .1)									        # getting direction inputs
+            elif key == 'A': cx -= Decimal(w * .05)									        # getting direction inputs
+            elif key == 'd': cx += Decimal(w * .1)									        # getting direction inputs
+            elif key == 'D': cx += Decimal(w * .05)									        # getting direction inputs
+            elif key == 'w': cy -= Decimal(w * .1)									        # getting direction inputs
+            elif key == 'W': cy -= Decimal(w * .05)									        # getting direction inputs
+            elif key == 's': cy += Decimal(w * .1)									        # getting direction inputs
+            elif key == 'S': cy += Decimal(w * .05)									        # getting direction inputs
+            elif key == 'q': w *= .9      											        # getting zoom inputs
+            elif key == 'Q': w *= .95      											        # getting zoom inputs
+            elif key == 'e': w *= 1.1     											        # getting zoom inputs
+            elif key == 'E': w *= 1.05     											        # getting zoom inputs
+            elif key == 'z': maxiters *= .9; maxiters = int(maxiters)   			        # decreasing iters
+            elif key == 'Z': maxiters *= .95; maxiters = int(maxiters)   			        # decreasing iters
+            elif key == 'c': maxiters *= 1.1; maxiters = int(maxiters)  			        # increasing iters
+            elif key == 'C': maxiters *= 1.05; maxiters = int(maxiters)  			        # increasing iters
+            elif key.lower() == 'v': mandelanimrender(cx, cy, w, maxiters, choice, noise)   # calling anim output for current point
+            elif key.lower() == 'i':                                                        # getting pushing current coords to array for julia pan
+                waypoints.append((float(cx), float(cy)))
+                if len(waypoints) > 1: # if this is the second point calls julia pan with coord list
+                    juliapan(waypoints, choice, noise)
+                    waypoints = []     # resets coord list
+            elif key.lower() == 'm': choice += 1; choice %= 3                               # switches between the 3 color modes
+            elif key.lower() == 'n': noise.newcolors()                                      # randomizes colors for noise
+            elif key.lower() == 'h': hud.show = not hud.show                                # shows or hides the frame timings
+            elif key.lower() == 'u': functions.autoiters = not functions.autoiters; state['budgetat'] = None # switches the automatic iteration budget on or off
+            elif key.lower() == 'j': state['inset'] = atlas is not None and not state['inset'] # shows or hides the julia inset
+            elif key.lower() == ' ': julialoop(float(cx), float(cy), choice, noise, hud, atlas)     			        # calling anim output for current point
+            elif key.lower() == 'r': cx = Decimal(-.5); cy = Decimal(0); w = 5.0; maxiters = 100 # resetting to default values
+            elif key.lower() == 'x': 		
+                try:										                                # getting user input for coords to jump to
+                    system('reset') # resets console to print input
+                    cx = Decimal(ask('CenterX: ').strip()) # keeps every digit that was typed in
+                    cy = Decimal(ask('CenterY: ').strip())
+                except (ValueError, InvalidOperation):
+                    pass
+                tty.setraw(sys.stdin) # sets console back to raw to recieve input
+            elif key.lower() == 'b':                                                        # opens bookmark window
+                picked = pickmark(marks, cache, choice, noise)
+                if picked == '+ New':
+                    system('reset')
+                    marks.add(str(ask('Choose a name for the bookmark: ')), [float(cx), float(cy), w, maxiters])
+                    tty.setraw(sys.stdin)
+                elif picked is not None:
+                    x, y, w, maxiters = marks.get(picked)
+                    cx, cy = Decimal(x), Decimal(y)
+                    grid = cache.get(picked, 'screen')
+                    if grid is not None: # the render finds the view already computed and draws it straight away
+                        getcontext().prec = refprec(w)
+                        view.put(*(markview(marks.get(picked), cache.size)[:5] + (grid,)))
+            elif key.lower() == 'f':                                                        # calling the menu to choose resolution for image output
+                mandelimg(cx, cy, w, maxiters, choice, noise)
+            else:
+                pass														                # if not an accepted input continues loop
+            if key.lower() in 'vibxf ': frame.reset()                                  # these draw over the screen so the next frame is sent in full
+            state['away'] = False
+    worker.close()
+    cache.close()
     system('reset') # sets console back to original state
 
-def julialoop(mandelx, mandely, choice, noise):
-    '''main loop for the command line drawing of the julia set'''
+def julialoop(mandelx, mandely, choice, noise, hud = None, atlas = None):
+    '''main loop for the command line drawing of the julia set, with an atlas a frame out of it is drawn while a new view renders'''
     system('printf \\\\033c')  # clearing the screen, works faster than calling system("clear")
     tty.setraw(sys.stdin)  # preparin to take the raw keyboard input
     # initiating the starting vars
-    cx = 0.0
-    cy = 0.0
+    cx = Decimal(0) # Decimal like the mandelbrot loop so panning still works once double-double takes over
+    cy = Decimal(0)
     w = 4.0
     maxiters = 100
+    frame = frameEncoder()
+    view = viewCache(lambda cx, cy, w, h, maxiter, width, height, vieww, viewsize, progress: juliaview(
+        cx, cy, w, h, mandelx, mandely, maxiter, width, height, vieww, viewsize, progress),
+        lambda cx, cy, w, h, maxiter, width, height, xs, ys, vieww: juliapoints(cx, cy, w, h, mandelx, mandely, maxiter, width, height, xs, ys, vieww))
+    hud = hud or frameHud()
+    state = {'persample': 0.0, 'budget': maxiters, 'budgetat': None}
 
-    while 1:  # main loop
+    def render(target, cancelled):
+        '''draws one view on the render thread, same passes as the mandelbrot loop'''
+        cx, cy, w, maxiters, choice = target
+        def progress(columns):
+            if cancelled(): raise Cancelled()
+        hud.start()
         rows, columns = popen('stty size', 'r').read().split()  # getting size
         height = int(rows)  # setting vars for size
         width = int(columns) + 1
+        hud.lap('size')
         # correcting aspect ratio, command line output is almost exactly a 1:2 aspect ratio
         h = (w * height * 2) / width
-        # setting min and max values for calling mandelfast
-        minx = cx - .5 * w
-        maxx = cx + .5 * w
-        miny = cy - .5 * h
-        maxy = cy + .5 * h
+        getcontext().prec = refprec(w)
+        if functions.autoiters:
+            maxiters = budgetfor(state, lambda cx, cy, w, h: juliabudget(cx, cy, w, h, mandelx, mandely), cx, cy, w, h)
+            hud.lap('budget')
+
+        if atlas is not None and not view.cached(w, h, maxiters, width * 2, height * 2):
+            frame.draw(juliashade(atlas.view(mandelx, mandely, float(cx), float(cy), w, h, width, height * frame.rows), choice, noise)[frame.rows:, 1:])
+            sys.stdout.flush()
+            hud.lap('atlas')
+        if not view.cached(w, h, maxiters, width * 2, height * 2) and state['persample'] * width * height * 4 > previewtime:
+            for step in previewsteps:
+                samples = juliaview(cx, cy, w, h, mandelx, mandely, maxiters, -(-width // step), -(-height // step), progress = progress)
+                rgb = juliashade(samples, choice, noise)
+                frame.draw(rgb.repeat(step * frame.rows, 0).repeat(step, 1)[:(height - 1) * frame.rows, :width - 1])
+                sys.stdout.flush()
+            hud.lap('preview')
 
         # getting per character iterations for printing to console
-        iters = juliafast(minx, maxx, miny, maxy, mandelx, mandely, maxiters, width, height)
-        if choice == 0:
-            iters -= iters.min()
-        iters %= iters.max()
-        maximum = iters.max() + 1
-
-        colors = cols(choice, maximum + 1, noise)
-
-        sys.stdout.write(u'\u001b[0;1f')  # resetting cursor to top left
-        for y in range(1, height):
-            for x in range(1, width):
-                print(u'\u001b[48;2;' + str(colors[iters[x, y], 0]) + ';' + str(colors[iters[x, y], 1]) + ';' + str(colors[iters[x, y], 2]) + 'm ', end='')
+        start = default_timer()
+        grid = view.get(cx, cy, w, h, maxiters, width * 2, height * 2, progress)
+        if view.computed == grid.size:
+            state['persample'] = (default_timer() - start) / grid.size
+        hud.lap('iters')
+        rgb = juliashade(pixels(grid, frame.rows), choice, noise)[frame.rows:, 1:] # same cells the old nested print loop covered
+        hud.lap('colors')
+        if cancelled(): raise Cancelled()
+        frame.draw(rgb)
+        hud.lap('draw')
+        hud.finish(grid, maxiters, view.computed, frame.bytes, frame.fullbytes,
+                   {'loop': 'julia', 'x': str(cx), 'y': str(cy), 'w': w, 'iters': maxiters, 'width': width, 'height': height, 'choice': choice, 'mx': mandelx, 'my': mandely})
         coords = u"\u001b[0mX: " + str(ndec(cx, 5)) + " " * 5 + "Y: " + str(ndec(cy, 5)) + " " * \
             5 + "Width: " + str(ndec(w, 5)) + " " * 5 + \
-            "Iters: " + str(maxiters) + u"\u001b[0K"
+            "Iters: " + str(maxiters) + (" auto" if functions.autoiters else "") + " " * 5 + "Bytes: " + str(frame.bytes) + "/" + str(frame.fullbytes) + hud.line() + u"\u001b[0K"
         print(coords, end='') # same as mandelbrot loop, prints coords, width and iterations to the bottom left of the screen
-
-        key = sys.stdin.read(1)
-        if ord(key) == 3: break														# taking raw input so breaking if escape sequence is used
-        elif key == 'a': cx -= w * .1 												# getting direction inputs
-        elif key == 'A': cx -= w * .05 												# getting direction inputs
-        elif key == 'd': cx += w * .1 												# getting direction inputs
-        elif key == 'D': cx += w * .05 												# getting direction inputs
-        elif key == 'w': cy -= w * .1 												# getting direction inputs
-        elif key == 'W': cy -= w * .05 												# getting direction inputs
-        elif key == 's': cy += w * .1 												# getting direction inputs
-        elif key == 'S': cy += w * .05 												# getting direction inputs
-        elif key == 'q': w *= .9      												# getting zoom inputs
-        elif key == 'Q': w *= .95      												# getting zoom inputs
-        elif key == 'e': w *= 1.1     												# getting zoom inputs
-        elif key == 'E': w *= 1.05     												# getting zoom inputs
-        elif key == 'z': maxiters *= .9; maxiters = int(maxiters)   				# decreasing iters
-        elif key == 'Z': maxiters *= .95; maxiters = int(maxiters)   				# decreasing iters
-        elif key == 'c': maxiters *= 1.1; maxiters = int(maxiters)  				# increasing iters
-        elif key == 'C': maxiters *= 1.05; maxiters = int(maxiters)  				# increasing iters
-        elif key.lower() == 'n': noise.newcolors()                                  # regenerates colors for noise coloration
-        elif key.lower() == 'r': cx = 0; cy = 0; w = 4.0; maxiters = 100  			# resetting to default values
-        elif key.lower() == 'f': juliaimg(cx, cy, mandelx, mandely, w, maxiters, choice, noise) # calls function to render current julia set as image
-        elif key.lower() == ' ': break                                              # returns to the mandelbrot set loop
-        else:
-            pass																	# if not an accepted input continues loop
         sys.stdout.flush()
 
+    worker = renderThread(render)
+    while 1:  # main loop
+        worker.show((cx, cy, w, maxiters, choice))
+        keys = read(sys.stdin.fileno(), 1024).decode('latin-1')
+        if '\x03' in keys or ' ' in keys: break                                      # taking raw input so breaking if escape sequence is used, space returns to the mandelbrot set loop
+        for key in keys:
+            getcontext().prec = refprec(w) # same as the mandelbrot loop
+            if key.lower() == 'f': worker.cancel()                                  # the image menu writes to the terminal itself
+            if functions.autoiters:
+                maxiters = state['budget'] # same as the mandelbrot loop
+                if key in 'zZcC': functions.autoiters = False
+            if key == 'a': cx -= Decimal(w * .1) 												# getting direction inputs
+            elif key == 'A': cx -= Decimal(w * .05) 												# getting direction inputs
+            elif key == 'd': cx += Decimal(w * .1) 												# getting direction inputs
+            elif key == 'D': cx += Decimal(w * .05) 												# getting direction inputs
+            elif key == 'w': cy -= Decimal(w * .1) 												# getting direction inputs
+            elif key == 'W': cy -= Decimal(w * .05) 												# getting direction inputs
+            elif key == 's': cy += Decimal(w * .1) 												# getting direction inputs
+            elif key == 'S': cy += Decimal(w * .05) 												# getting direction inputs
+            elif key == 'q': w = max(w * .9, ddwidth)      							# getting zoom inputs, double-double runs out past ddwidth
+            elif key == 'Q': w = max(w * .95, ddwidth)      							# getting zoom inputs
+            elif key == 'e': w *= 1.1     												# getting zoom inputs
+            elif key == 'E': w *= 1.05     												# getting zoom inputs
+            elif key == 'z': maxiters *= .9; maxiters = int(maxiters)   				# decreasing iters
+            elif key == 'Z': maxiters *= .95; maxiters = int(maxiters)   				# decreasing iters
+            elif key == 'c': maxiters *= 1.1; maxiters = int(maxiters)  				# increasing iters
+            elif key == 'C': maxiters *= 1.05; maxiters = int(maxiters)  				# increasing iters
+            elif key.lower() == 'n': noise.newcolors()                                  # regenerates colors for noise coloration
+            elif key.lower() == 'h': hud.show = not hud.show                            # shows or hides the frame timings
+            elif key.lower() == 'u': functions.autoiters = not functions.autoiters; state['budgetat'] = None # switches the automatic iteration budget on or off
+            elif key.lower() == 'r': cx = Decimal(0); cy = Decimal(0); w = 4.0; maxiters = 100  			# resetting to default values
+            elif key.lower() == 'f': juliaimg(cx, cy, mandelx, mandely, w, maxiters, choice, noise); frame.reset() # calls function to render current julia set as image
+            else:
+                pass																	# if not an accepted input continues loop
+    worker.close()
+
 if __name__ == '__main__':
+    parser = ArgumentParser(description = 'explores the mandelbrot set in the terminal')
+    parser.add_argument('--hud', action = 'store_true', help = 'starts with the frame timings shown, h toggles them')
+    parser.add_argument('--trace', default = None, help = 'file to add a line of json to for every frame drawn')
+    parser.add_argument('--warmup', action = 'store_true', help = 'compiles the image and animation kernels in the background after the first frame')
+    parser.add_argument('--precompile', action = 'store_true', help = 'compiles every kernel into the disk cache and exits')
+    parser.add_argument('--buildatlas', action = 'store_true', help = 'computes the julia atlas the inset and julia previews come from and exits')
+    parser.add_argument('--halfblock', action = 'store_true', help = 'draws two pixels in every cell with half block characters, twice the rows out of the same samples')
+    parser.add_argument('--colors', choices = colormodes, default = 'truecolor', help = 'colors sent to the terminal, 256 and 16 make the escapes shorter for slow links')
+    parser.add_argument('--farm', default = None, metavar = 'HOST:PORT', help = 'renders images and animations on mandelworker.py processes connecting here, an empty host only takes workers on this machine')
+    parser.add_argument('--farmkey', default = None, help = 'shared secret the workers have to give, made up and printed if not given')
+    parser.add_argument('--keep', action = 'store_true', help = 'saves the iterations behind every image and animation so mandelrecolor.py can color them again')
+    parser.add_argument('--autoiters', action = 'store_true', help = 'starts with the iteration budget worked out from each view, u toggles it, zoom animations use it too')
+    parser.add_argument('--smooth', action = 'store_true', help = 'renders images with continuous escape counts so the colors blend instead of banding')
+    args = parser.parse_args()
+    functions.keepiters = args.keep
+    functions.autoiters = args.autoiters
+    functions.smoothiters = args.smooth
+    terminal.halfblock, terminal.colormode = args.halfblock, args.colors
+    if args.farm:
+        farm.farmaddress = farm.parseaddress(args.farm)
+        farm.farmkey = args.farmkey.encode('ascii') if args.farmkey else None
+    if args.precompile:
+        warmkernels()
+        sys.exit(0)
+    if args.buildatlas:
+        buildatlas()
+        sys.exit(0)
     if not path.isdir("./images/"): mkdir("./images/") # checks if needed folders exist for image and animation output
     if not path.isdir("./zoomcache/"): mkdir("./zoomcache/")
     if not path.isdir("./itercache/"): mkdir("./itercache/")
     if not path.isdir("./janimcache/"): mkdir("./janimcache/")
     if not path.isdir("./anim/"): mkdir("./anim/")
-    mandelloop() # starts main loop
+    hud = frameHud(args.hud, args.trace, launched)
+    mandelloop(hud, args.warmup, loadatlas()) # starts main loop, the inset stays off until an atlas has been built
+    hud.close()
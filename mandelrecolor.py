@@ -0,0 +1,23 @@
+from __future__ import print_function
+
+from argparse import ArgumentParser
+
+from dependencies.batch import palettes
+from dependencies.colors import noiseColor
+from dependencies.recolor import recolor
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'colors the iterations kept next to an image or animation again without iterating anything')
+    parser.add_argument('store', help = '.npz file written next to a render with keeping iterations turned on')
+    parser.add_argument('-p', '--palette', default = 'gnuplot', help = 'grayscale, gnuplot, noise or the color mode number')
+    parser.add_argument('-n', '--noise', type = float, nargs = 4, default = None, metavar = ('R1', 'R2', 'R3', 'SCALE'),
+                        help = 'seeds and scale of the noise palette, random by default')
+    parser.add_argument('--highlight', type = int, default = -1, help = 'only color this iteration, images and zoom or pan frames only')
+    parser.add_argument('-o', '--output', default = None, help = 'file to write, next to the store by default')
+    args = parser.parse_args()
+
+    number = int(palettes.get(args.palette, args.palette))
+    noise = noiseColor()
+    if args.noise is not None:
+        noise.rand1, noise.rand2, noise.rand3, noise.scale = args.noise
+    print(recolor(args.store, number, noise, args.highlight, args.output))
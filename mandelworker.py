@@ -0,0 +1,14 @@
+from argparse import ArgumentParser
+
+from dependencies.farm import parseaddress, work
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'renders tiles and frames for a mandelcmd.py or mandelbatch.py started with --farm')
+    parser.add_argument('coordinator', help = 'host:port the coordinator listens on, its --farm with the host filled in')
+    parser.add_argument('-k', '--key', required = True, help = 'shared secret, the coordinator\'s --farmkey or the one it printed')
+    parser.add_argument('--once', action = 'store_true', help = 'exits after one coordinator is done instead of waiting for the next')
+    args = parser.parse_args()
+    try:
+        work(parseaddress(args.coordinator), args.key.encode('ascii'), args.once)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+from decimal import Decimal, getcontext, localcontext
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'dependencies'))
+
+from numpy import empty, int64, linspace
+
+import functions
+from perturb import mandeldeep, refprec
+
+
+def brute(cx, cy, w, h, maxiter, width, height, julia = None):
+    '''escape counts of the same samples the engines take, iterated one point at a time in 60 digit Decimal'''
+    iters = empty((width, height), int64)
+    dx, dy = linspace(-.5 * w, .5 * w, width), linspace(-.5 * h, .5 * h, height)
+    with localcontext() as ctx:
+        ctx.prec = 60
+        for i in range(width):
+            for j in range(height):
+                x, y = cx + Decimal(dx[i]), cy + Decimal(dy[j])
+                mx, my = (x, y) if julia is None else (Decimal(julia[0]), Decimal(julia[1]))
+                n = 1
+                while n < maxiter and x * x + y * y < 4:
+                    x, y = x * x - y * y + mx, 2 * x * y + my
+                    n += 1
+                iters[i, j] = n
+    return iters
+
+
+class deepTest(unittest.TestCase):
+    '''renders small views past float64 and compares every sample with brute force iteration'''
+    def setUp(self):
+        self.prec = getcontext().prec
+
+    def tearDown(self):
+        getcontext().prec = self.prec
+
+    def test_perturbation_matches_brute_force(self):
+        # float64 itself already loses a few of these samples at 1e-6, so the reference has to be exact
+        for cx, cy, w, maxiter in [(Decimal('-0.743643887037151'), Decimal('0.131825904205330'), 1e-6, 2000),
+                                   (Decimal('-1.7476656377212199'), Decimal('-0.000959780242618983'), 1e-16, 2000)]:
+            getcontext().prec = refprec(w)
+            h = w * 14 / 24
+            deep = mandeldeep(cx, cy, w, h, maxiter, 24, 14)
+            reference = brute(cx, cy, w, h, maxiter, 24, 14)
+            self.assertGreater(reference.max() - reference.min(), 100, 'the view has no detail to get wrong')
+            self.assertLessEqual((deep != reference).sum(), 2, 'perturbation is off at width ' + str(w))
+
+    def test_double_double_julia_matches_brute_force(self):
+        # a point on the rabbit's boundary, found by bisecting between a point that stays and one that escapes in 1000 iterations
+        cx, cy = Decimal('0.3522364287970849692866703345'), Decimal('0.1083804396298722982420524106')
+        for w in [1e-20, 1e-24]:
+            h = w * 14 / 24
+            self.assertEqual(functions.precision(w, True, 24, cx), 'doubledouble')
+            dd = functions.juliaview(cx, cy, w, h, -.123, .745, 1000, 24, 14)
+            reference = brute(cx, cy, w, h, 1000, 24, 14, (-.123, .745))
+            self.assertGreater(reference.max() - reference.min(), 100, 'the view has no detail to get wrong')
+            self.assertLessEqual((dd != reference).sum(), 2, 'double-double is off at width ' + str(w))
+
+
+if __name__ == '__main__':
+    unittest.main()
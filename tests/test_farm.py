@@ -0,0 +1,107 @@
+import os
+import socket
+import sys
+import tempfile
+import unittest
+from json import dumps, loads
+from shutil import rmtree
+from subprocess import PIPE, Popen
+from time import sleep, time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+startup = 600   # seconds the batch gets to compile its kernels and start listening
+
+
+def freeport():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def listening(port):
+    sock = socket.socket()
+    try:
+        sock.connect(('127.0.0.1', port))
+        return True
+    except (IOError, OSError):
+        return False
+    finally:
+        sock.close()
+
+def finish(process, seconds):
+    '''waits for a process like communicate(timeout = seconds), which python 2 doesn't have'''
+    end = time() + seconds
+    while process.poll() is None and time() < end:
+        sleep(.25)
+    if process.poll() is None:
+        process.kill()
+    return process.wait()
+
+
+class farmTest(unittest.TestCase):
+    '''runs the command lines themselves, the flags have to reach the farm module the renderers read'''
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.env = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONPATH') # the scripts have to find their modules themselves
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        rmtree(self.folder)
+
+    def start(self, *args):
+        process = Popen((sys.executable,) + args, cwd = self.folder, env = self.env, stdout = PIPE, stderr = PIPE)
+        self.processes.append(process)
+        return process
+
+    def test_scripts_start_from_anywhere(self):
+        for script in ['mandelbatch.py', 'mandelbench.py', 'mandelrecolor.py', 'mandelworker.py']:
+            process = self.start(os.path.join(root, script), '--help')
+            self.assertEqual(finish(process, startup), 0, process.stderr.read())
+
+    def test_batch_job_reaches_worker(self):
+        with open(os.path.join(self.folder, 'jobs.json'), 'w') as f:
+            f.write(dumps([{'type': 'image', 'x': -.5, 'y': 0.0, 'w': 3.0, 'iters': 100, 'res': [64, 36], 'aa': 1}]))
+        port = freeport()
+        batch = self.start(os.path.join(root, 'mandelbatch.py'), 'jobs.json', '--farm', '127.0.0.1:' + str(port), '--farmkey', 'testkey')
+        end = time() + startup
+        while not listening(port):
+            self.assertIsNone(batch.poll(), 'the batch finished without ever listening for workers')
+            self.assertLess(time(), end, 'nothing listened on the farm port')
+            sleep(.25)
+        sleep(2)
+        self.assertIsNone(batch.poll(), 'the batch rendered without a worker')
+
+        worker = self.start(os.path.join(root, 'mandelworker.py'), '127.0.0.1:' + str(port), '--key', 'testkey', '--once')
+        code = finish(batch, startup)
+        errors = batch.stderr.read()
+        self.assertEqual(code, 0, errors)
+        self.assertEqual(finish(worker, 60), 0, worker.stderr.read())
+        self.assertIn(b'waiting for workers', errors) # the render stopped for a worker instead of going on locally
+        with open(os.path.join(self.folder, 'manifest.json')) as f:
+            manifest = loads(f.read())
+        entries = manifest['jobs'] if isinstance(manifest, dict) else manifest
+        self.assertEqual([entry['status'] for entry in entries], ['done'])
+        self.assertTrue(os.path.exists(os.path.join(self.folder, entries[0]['output'])))
+
+    def test_worker_with_the_wrong_key_is_turned_away(self):
+        with open(os.path.join(self.folder, 'jobs.json'), 'w') as f:
+            f.write(dumps([{'type': 'image', 'x': -.5, 'y': 0.0, 'w': 3.0, 'iters': 100, 'res': [64, 36], 'aa': 1}]))
+        port = freeport()
+        batch = self.start(os.path.join(root, 'mandelbatch.py'), 'jobs.json', '--farm', ':' + str(port), '--farmkey', 'testkey')
+        end = time() + startup
+        while not listening(port):
+            self.assertIsNone(batch.poll(), 'the batch finished without ever listening for workers')
+            self.assertLess(time(), end, 'nothing listened on the farm port')
+            sleep(.25)
+        worker = self.start(os.path.join(root, 'mandelworker.py'), '127.0.0.1:' + str(port), '--key', 'wrongkey', '--once')
+        self.assertNotEqual(finish(worker, 60), 0)
+        self.assertIsNone(batch.poll(), 'the batch rendered through a worker with the wrong key')
+
+
+if __name__ == '__main__':
+    unittest.main()
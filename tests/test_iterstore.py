@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+from shutil import rmtree
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'dependencies'))
+
+from numpy import asarray, array, float32, int64, uint16, uint32
+from numpy.random import RandomState
+from PIL import Image
+
+import functions
+from colors import noiseColor
+from iterstore import (iterReader, iterWriter, storename, storetol,
+                       storeversion)
+from kernels import kernelversion
+from recolor import recolor
+
+
+class iterstoreTest(unittest.TestCase):
+    '''writes iterations to a store and reads them back, and recolors a kept render against the render itself'''
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        self.keepiters = functions.keepiters
+
+    def tearDown(self):
+        functions.keepiters = self.keepiters
+        os.chdir(self.cwd)
+        rmtree(self.folder)
+
+    def test_members_come_back_as_written(self):
+        random = RandomState(3)
+        members = {
+            'shallow': random.randint(1, 500, (40, 30)).astype(uint16),
+            'deep': (random.randint(0, 200, (40, 30)) + 70000).astype(uint32),      # past uint16 but close together
+            'wide': random.randint(0, 4000000, (40, 30)).astype(uint32),
+            'smooth': (random.rand(40, 30) * 90 + 3).astype(float32),
+            'smooth deep': (random.rand(40, 30) * 9000 + 120000).astype(float32), # float16 can't keep a fraction of these
+            'empty': array([], uint16),
+        }
+        name = os.path.join(self.folder, 'kept.npz')
+        store = iterWriter(name, {'kind': 'image', 'res': [40, 30]})
+        for key in sorted(members):
+            store.add(key, members[key])
+        store.close(done = True)
+        self.assertFalse(os.path.exists(name + '.part'))
+
+        kept = iterReader(name)
+        self.assertEqual(kept.meta, {'kind': 'image', 'res': [40, 30], 'done': True, 'kernel': kernelversion, 'format': storeversion})
+        self.assertEqual(kept.keys(), sorted(members))
+        for key in members:
+            back = kept.get(key)
+            self.assertEqual(back.dtype, members[key].dtype, key)
+            self.assertEqual(back.shape, members[key].shape, key)
+            if back.dtype.kind == 'f':
+                self.assertLessEqual(abs(back - members[key]).max(), storetol, key)
+            else:
+                self.assertEqual(back.tolist(), members[key].tolist(), key)
+
+    def test_recolored_image_matches_the_render(self):
+        os.chdir(self.folder)
+        os.mkdir('images')
+        functions.keepiters = True
+        noise = noiseColor()
+        name = functions.mandelimggen(Decimal('-0.75'), Decimal('0.1'), 0.05, 600, (160, 90), 2, noise, 2, show = False)
+        again = recolor(storename(name), 2, noise, out = 'again.png')
+        self.assertEqual(abs(asarray(Image.open(again)).astype(int64) - asarray(Image.open(name))).max(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+from shutil import rmtree
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'dependencies'))
+
+from numpy import asarray, int64
+from PIL import Image
+
+import functions
+import poster
+from colors import noiseColor
+
+
+class posterTest(unittest.TestCase):
+    '''renders small images through posterimg the way mandelimggen does and compares the pngs'''
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.noise = noiseColor()
+        self.saved = poster.postertile, poster.adaptiveaa
+
+    def tearDown(self):
+        poster.postertile, poster.adaptiveaa = self.saved
+        rmtree(self.folder)
+
+    def render(self, view, tile, adaptive, name):
+        poster.postertile, poster.adaptiveaa = tile, adaptive
+        samples, points = functions.imagefuncs(view)
+        name = os.path.join(self.folder, name)
+        poster.posterimg(samples, view[5], view[6], 1, self.noise, name, [name], points)
+        return asarray(Image.open(name)).astype(int64)
+
+    def test_tiles_match_a_single_render(self):
+        for view in [('mandel', Decimal('-0.743643887037151'), Decimal('0.131825904205330'), 1e-8, 1500, (600, 340), 2, False, 20),
+                     ('mandel', Decimal('-0.74364388703715870475219150611477'), Decimal('0.13182590420531197049121740490459'), 1e-16, 800,
+                      (300, 170), 2, False, 36)]:
+            tiled = self.render(view, 256, False, 'tiled.png')
+            single = self.render(view, 10000, False, 'single.png')
+            self.assertEqual(abs(tiled - single).max(), 0, 'tiling moved pixels at width ' + str(view[3]))
+
+    def test_adaptive_aa_matches_full_supersampling(self):
+        # the main view's necks and antennae are filaments thinner than a pixel, most base samples around them miss them
+        for view in [('mandel', Decimal('-0.5'), Decimal(0), 4.5, 100, (320, 180), 4, False, 20),
+                     ('mandel', Decimal('-0.5'), Decimal(0), 3.0, 500, (480, 270), 4, False, 20)]:
+            difference = abs(self.render(view, 256, True, 'adaptive.png') - self.render(view, 256, False, 'full.png'))
+            self.assertLessEqual(difference.max(), 32, 'a pixel is off by ' + str(difference.max()) + '/255 at width ' + str(view[3]))
+            self.assertLess(difference.mean(), .05)
+
+    def test_supersampled_views_leave_float64_in_time(self):
+        # at 2e-13 wide 400 samples are still apart in float64, 960 pixels at 8x aa would share columns
+        at = max(abs(Decimal('-0.743643887037151')), abs(Decimal('0.131825904205330')))
+        self.assertEqual(functions.precision(2e-13, False, 400, at), 'double')
+        self.assertEqual(functions.precision(2e-13, False, 960 * 8, at), 'perturbation')
+        self.assertEqual(functions.precision(2e-13, True, 960 * 8, at), 'doubledouble')
+        self.assertEqual(functions.precision(3.0, False, 960 * 8, at), 'double')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import re
+import sys
+import unittest
+from io import StringIO
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'dependencies'))
+
+from numpy import array, concatenate, ones, uint8
+from numpy.random import RandomState
+
+from terminal import frameEncoder, quantize
+
+# xterm's 256 colors written out the long way, the 16 basic ones then the 6x6x6 cube and the 24 grays
+basic = [(0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+         (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255)]
+levels = [0, 95, 135, 175, 215, 255]
+xterm = array(basic + [(r, g, b) for r in levels for g in levels for b in levels] + [(v, v, v) for v in range(8, 239, 10)])
+escapes = re.compile(u'\u001b\\[(\\d+);(\\d+)H|\u001b\\[([\\d;]*)m|([ \u2580]+)')
+
+
+class screen:
+    '''the little of a terminal the encoder relies on, cursor moves, sgr colors and the two glyphs it prints'''
+    def __init__(self, rows, columns):
+        self.cells = [[None] * columns for i in range(rows)] # (top, bottom) color of every cell, as quantize numbers them
+        self.fg, self.bg = None, None
+        self.y, self.x = 0, 0
+
+    def sgr(self, params):
+        params = [int(p) for p in params.split(';')]
+        while params:
+            p = params.pop(0)
+            if p == 0:
+                self.fg, self.bg = None, None
+            elif p in (38, 48):
+                if params.pop(0) == 2:
+                    color = (params[0] << 16) | (params[1] << 8) | params[2]
+                    params = params[3:]
+                else:
+                    color = params.pop(0)
+                if p == 38:
+                    self.fg = color
+                else:
+                    self.bg = color
+            elif p < 40 or 90 <= p < 98:
+                self.fg = p - 30 if p < 90 else p - 82
+            else:
+                self.bg = p - 40 if p < 100 else p - 92
+
+    def feed(self, text):
+        for row, column, params, glyphs in escapes.findall(text):
+            if row:
+                self.y, self.x = int(row) - 1, int(column) - 1
+            elif glyphs:
+                for glyph in glyphs:
+                    self.cells[self.y][self.x] = (self.fg, self.bg) if glyph == u'\u2580' else (self.bg, self.bg)
+                    self.x += 1
+            else:
+                self.sgr(params)
+
+
+class terminalTest(unittest.TestCase):
+    '''draws frames through frameEncoder onto a stand-in screen and checks it against the frames themselves'''
+    def setUp(self):
+        self.stdout = sys.stdout
+        self.random = RandomState(7)
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def draw(self, encoder, rgb, onto):
+        sys.stdout = StringIO()
+        try:
+            sent = encoder.draw(rgb)
+            text = sys.stdout.getvalue()
+        finally:
+            sys.stdout = self.stdout
+        self.assertEqual(sent, len(text.encode('utf-8')))
+        onto.feed(text)
+        return sent
+
+    def shown(self, onto, rgb, mode, half):
+        '''checks a screen shows a frame, every cell as its top and bottom color'''
+        colors = quantize(rgb, mode)
+        top, bottom = (colors[0::2], colors[1::2]) if half else (colors, colors)
+        self.assertEqual(onto.cells, [[(int(t), int(b)) for t, b in zip(*pair)] for pair in zip(top, bottom)])
+
+    def frames(self, rows, columns):
+        '''a frame in bands of a few colors so it has runs to join, and a copy of it with a few patches changed'''
+        palette = self.random.randint(0, 256, (5, 3)).astype(uint8)
+        bands = self.random.randint(0, 5, (rows, 1)) + ones((rows, columns), int).cumsum(axis = 1) // 7
+        first = palette[bands % 5]
+        second = first.copy()
+        second[3:5, 2:12] = palette[0]
+        second[-2:, -3:] = self.random.randint(0, 256, (2, 3, 3))
+        second[rows // 2, 20] = 255 - second[rows // 2, 20]
+        return first, second
+
+    def check(self, half, mode):
+        first, second = self.frames(24, 40)
+        rows = 12 if half else 24
+        encoder, onto = frameEncoder(half, mode), screen(rows, 40)
+        everything = self.draw(encoder, first, onto)
+        self.shown(onto, first, mode, half)
+        changed = self.draw(encoder, second, onto)
+        self.shown(onto, second, mode, half)
+        self.assertLess(changed, everything / 4)
+        self.assertEqual(self.draw(encoder, second, onto), len(u'\u001b[0m\u001b[' + str(rows + 1) + ';1H')) # nothing left to send
+        encoder.reset()
+        onto.cells = [[None] * 40 for i in range(rows)]
+        self.draw(encoder, second, onto)
+        self.shown(onto, second, mode, half)
+
+    def test_only_changed_cells_are_sent(self):
+        self.check(False, 'truecolor')
+
+    def test_half_blocks_and_palettes_only_send_changed_cells(self):
+        for half in [False, True]:
+            for mode in ['truecolor', '256', '16']:
+                self.check(half, mode)
+
+    def test_palette_colors_are_the_nearest(self):
+        grays = array([(v, v, v) for v in range(256)])
+        rgb = concatenate((self.random.randint(0, 256, (64 * 64, 3)), grays, xterm)).astype(uint8).reshape(1, -1, 3)
+        for mode, first, last in [('256', 16, 256), ('16', 0, 16)]:
+            errors = ((rgb[0, :, None, :].astype(int) - xterm[first:last]) ** 2).sum(axis = 2)
+            chosen = quantize(rgb, mode)[0].astype(int)
+            self.assertTrue(((chosen >= first) & (chosen < last)).all())
+            self.assertEqual(list(errors[range(len(chosen)), chosen - first]), list(errors.min(axis = 1)), mode + ' passed over a nearer color')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+from decimal import Decimal, getcontext
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'dependencies'))
+
+from functions import mandelpoints, mandelsamples
+from perturb import refprec
+from viewcache import viewCache
+
+
+class viewCacheTest(unittest.TestCase):
+    '''pans and deepens a view through the cache and compares every grid with one computed from scratch'''
+    def setUp(self):
+        self.prec = getcontext().prec
+
+    def tearDown(self):
+        getcontext().prec = self.prec
+
+    def fresh(self, cx, cy, w, h, maxiter, width, height):
+        return viewCache(mandelsamples, mandelpoints).get(cx, cy, w, h, maxiter, width, height)
+
+    def test_pans_and_deepening_match_a_fresh_grid(self):
+        # a sample can land an ulp away from where a fresh grid puts it, a count or two along a filament can move with it
+        width, height = 160, 48
+        for cx, cy, w, maxiter in [(Decimal('-0.75'), Decimal('0.1'), 0.05, 500),
+                                   (Decimal('-0.5047599789812914'), Decimal('-0.5190760212238473'), 0.016906959567613646, 500),
+                                   (Decimal('-1.7476656377212199'), Decimal('-0.000959780242618983'), 1e-15, 1500)]:
+            getcontext().prec = refprec(w)
+            h = w * height / width
+            view = viewCache(mandelsamples, mandelpoints)
+            view.get(cx, cy, w, h, maxiter, width, height)
+            for fx, fy in [('0.137', '-0.21'), ('-0.3', '0.05')]:
+                cx, cy = cx + Decimal(w) * Decimal(fx), cy + Decimal(h) * Decimal(fy)
+                panned = view.get(cx, cy, w, h, maxiter, width, height)
+                self.assertLess(view.computed, width * height / 2, 'the pan started over')
+                self.assertLessEqual((panned != self.fresh(cx, cy, w, h, maxiter, width, height)).sum(), 2, 'pan moved samples at width ' + str(w))
+            deeper = view.get(cx, cy, w, h, maxiter * 3, width, height)
+            self.assertLess(view.computed, width * height, 'raising the budget started over')
+            self.assertLessEqual((deeper != self.fresh(cx, cy, w, h, maxiter * 3, width, height)).sum(), 2, 'deepening moved samples at width ' + str(w))
+
+
+if __name__ == '__main__':
+    unittest.main()